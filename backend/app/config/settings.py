@@ -2,7 +2,10 @@
 Application settings and configuration management.
 """
 
-from typing import List, Optional
+import logging
+from functools import cached_property
+from types import MappingProxyType
+from typing import List, Optional, Mapping, Any
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -14,6 +17,10 @@ class Settings(BaseSettings):
     host: str = Field(default="localhost", description="Server host")
     port: int = Field(default=8000, description="Server port")
     debug: bool = Field(default=False, description="Debug mode")
+    workers: int = Field(
+        default=1,
+        description="Uvicorn worker processes; sessions and caches are per-process, so >1 needs sticky routing"
+    )
     cors_origins: List[str] = Field(
         default=["http://localhost:3000", "http://localhost:8080"],
         description="CORS allowed origins"
@@ -26,6 +33,8 @@ class Settings(BaseSettings):
     
     # PostgreSQL Configuration
     database_url: str = Field(default="postgresql://localhost/docsearch_rag", description="PostgreSQL database URL")
+    db_pool_min: int = Field(default=4, description="Minimum pooled PostgreSQL connections")
+    db_pool_max: int = Field(default=16, description="Maximum pooled PostgreSQL connections")
     
     # Weaviate Configuration
     weaviate_url: Optional[str] = Field(default=None, description="Weaviate instance URL")
@@ -35,6 +44,9 @@ class Settings(BaseSettings):
     # Embedding Configuration
     embedding_model: str = Field(default="voyage-2", description="Embedding model name")
     embedding_dimension: int = Field(default=1024, description="Embedding vector dimension")
+    use_halfvec: bool = Field(default=False, description="Store embeddings as halfvec (pgvector >= 0.7.0); applied by `python -m app.migrate`")
+    hnsw_build_workers: int = Field(default=7, description="Parallel maintenance workers for HNSW index builds")
+    hnsw_build_memory: str = Field(default="2GB", description="maintenance_work_mem for HNSW index builds")
     
     # LLM Configuration
     default_llm_provider: str = Field(default="openai", description="Default LLM provider")
@@ -43,6 +55,13 @@ class Settings(BaseSettings):
     temperature: float = Field(default=0.7, description="LLM temperature")
     top_k_results: int = Field(default=5, description="Number of top results for RAG")
     
+    # Semantic Cache (opt-in): replies are shared across sessions and are not
+    # invalidated when the corpus is re-ingested, only by TTL or restart
+    semantic_cache_enabled: bool = Field(default=False, description="Serve near-duplicate first questions from replies cached for any session")
+    semantic_cache_threshold: float = Field(default=0.95, description="Minimum query cosine similarity for a cache hit")
+    semantic_cache_size: int = Field(default=1024, description="Maximum cached replies")
+    semantic_cache_ttl_seconds: float = Field(default=3600, description="Lifetime of a cached reply")
+    
     # Session Storage
     mongodb_url: Optional[str] = Field(default=None, description="MongoDB connection URL")
     mongodb_database: str = Field(default="ragchat", description="MongoDB database name")
@@ -63,13 +82,36 @@ class Settings(BaseSettings):
     rate_limit_requests: int = Field(default=100, description="Rate limit requests per window")
     rate_limit_window: int = Field(default=3600, description="Rate limit window in seconds")
     
+    @cached_property
+    def log_level_int(self) -> int:
+        """Numeric logging level resolved once from log_level."""
+        return logging.getLevelNamesMapping()[self.log_level.upper()]
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 
-# Global settings instance
-settings = Settings()
+class LazySettings:
+    """Proxy that defers building Settings until the first attribute access."""
+    
+    __slots__ = ("_instance",)
+    
+    def __init__(self):
+        self._instance: Optional[Settings] = None
+    
+    def _load(self) -> Settings:
+        """Build and cache the Settings instance."""
+        if self._instance is None:
+            self._instance = Settings()
+        return self._instance
+    
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+
+# Global settings instance (.env is parsed on first attribute access)
+settings = LazySettings()
 
 
 # LLM Model configurations
@@ -85,7 +127,7 @@ LLM_MODELS = {
 }
 
 # Weaviate Schema Configuration
-WEAVIATE_SCHEMA = {
+_WEAVIATE_SCHEMA = {
     "class": "Documents",
     "description": "Document chunks for RAG search",
     "properties": [
@@ -113,12 +155,24 @@ WEAVIATE_SCHEMA = {
     "vectorizer": "none"
 }
 
+# Read-only view so the shared schema can't be mutated between syncs
+WEAVIATE_SCHEMA: Mapping[str, Any] = MappingProxyType(_WEAVIATE_SCHEMA)
+
+
+# Flat, read-only (provider, model) -> config index built once at import
+_MODEL_INDEX: Mapping[tuple, Mapping[str, Any]] = MappingProxyType({
+    (provider, model): MappingProxyType(config)
+    for provider, models in LLM_MODELS.items()
+    for model, config in models.items()
+})
+_EMPTY_CONFIG: Mapping[str, Any] = MappingProxyType({})
+
 
-def get_model_config(provider: str, model: str) -> dict:
+def get_model_config(provider: str, model: str) -> Mapping[str, Any]:
     """Get configuration for a specific model."""
-    return LLM_MODELS.get(provider, {}).get(model, {})
+    return _MODEL_INDEX.get((provider, model), _EMPTY_CONFIG)
 
 
 def validate_llm_config(provider: str, model: str) -> bool:
     """Validate if LLM provider and model combination is supported."""
-    return provider in LLM_MODELS and model in LLM_MODELS[provider]
+    return (provider, model) in _MODEL_INDEX
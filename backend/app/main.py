@@ -2,20 +2,28 @@
 FastAPI main application with WebSocket support for RAG Chat.
 """
 
+import asyncio
 import logging
+import sys
+import orjson
 import uvicorn
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from http import HTTPStatus
+from typing import Any, Dict, Tuple
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+from starlette.exceptions import HTTPException
 
 from app.config import settings
 from app.models import HealthResponse, ErrorResponse
+from app.services.llm_service import llm_service
+from app.services.vector_service import vector_service
 from app.websockets.chat_handler import router as websocket_router
 
 # Configure logging
 logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper()),
+    level=settings.log_level_int,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -28,12 +36,10 @@ async def lifespan(app: FastAPI):
     
     # Initialize services
     try:
-        # Initialize services
-        from app.services.vector_service import vector_service
-        from app.services.llm_service import llm_service
-        
-        await vector_service.initialize()
-        await llm_service.initialize()
+        await asyncio.gather(
+            vector_service.initialize(),
+            llm_service.initialize()
+        )
         
         logger.info("Services initialized successfully")
     except Exception as e:
@@ -46,9 +52,6 @@ async def lifespan(app: FastAPI):
     
     # Cleanup services
     try:
-        from app.services.vector_service import vector_service
-        from app.services.llm_service import llm_service
-        
         await vector_service.cleanup()
         await llm_service.cleanup()
         
@@ -70,23 +73,47 @@ app = FastAPI(
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins,
+    allow_origins=list(dict.fromkeys(settings.cors_origins)),
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["*"],
     allow_headers=["*"],
 )
 
 
+def _http_error_body(status_code: int, detail: str) -> Dict[str, Any]:
+    """ErrorResponse fields for an HTTPException; no timestamp, so bodies can be canned."""
+    return ErrorResponse(error=detail, code=f"HTTP_{status_code}").model_dump(exclude={"timestamp"})
+
+
+# Canned error bodies for common statuses raised with their default detail:
+# status_code -> (default phrase, encoded JSON body). Validation errors (422)
+# are RequestValidationError, not HTTPException, so they never reach this handler.
+_ERROR_CACHE: Dict[int, Tuple[str, bytes]] = {
+    code: (
+        HTTPStatus(code).phrase,
+        orjson.dumps(_http_error_body(code, HTTPStatus(code).phrase))
+    )
+    for code in (400, 401, 403, 404, 405, 500)
+}
+
+
 # Exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc: HTTPException):
-    """Handle HTTP exceptions."""
-    return JSONResponse(
+    """Handle HTTP exceptions (including Starlette routing 404/405s)."""
+    cached = _ERROR_CACHE.get(exc.status_code)
+    if cached is not None and exc.detail == cached[0]:
+        return Response(
+            content=cached[1],
+            status_code=exc.status_code,
+            headers=exc.headers,
+            media_type="application/json"
+        )
+    
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content=ErrorResponse(
-            error=exc.detail,
-            code=f"HTTP_{exc.status_code}"
-        ).dict()
+        headers=exc.headers,
+        content=_http_error_body(exc.status_code, exc.detail)
     )
 
 
@@ -94,13 +121,13 @@ async def http_exception_handler(request, exc: HTTPException):
 async def general_exception_handler(request, exc: Exception):
     """Handle general exceptions."""
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content=ErrorResponse(
             error="Internal server error",
             code="INTERNAL_ERROR",
             details={"message": str(exc)} if settings.debug else None
-        ).dict()
+        ).model_dump()
     )
 
 
@@ -109,12 +136,18 @@ async def general_exception_handler(request, exc: Exception):
 async def health_check():
     """Health check endpoint."""
     try:
-        from app.services.vector_service import vector_service
-        from app.services.llm_service import llm_service
-        
-        # Check service health
-        vector_health = await vector_service.health_check()
-        llm_health = await llm_service.health_check()
+        # Check service health concurrently; a failed probe reports as an error
+        vector_health, llm_health = await asyncio.gather(
+            vector_service.health_check(),
+            llm_service.health_check(),
+            return_exceptions=True
+        )
+        if isinstance(vector_health, Exception):
+            logger.error(f"Vector service health check failed: {vector_health}")
+            vector_health = {"status": "error"}
+        if isinstance(llm_health, Exception):
+            logger.error(f"LLM service health check failed: {llm_health}")
+            llm_health = {"status": "error"}
         
         overall_status = "healthy"
         if vector_health.get("status") != "healthy" or llm_health.get("status") != "healthy":
@@ -185,10 +218,19 @@ async def list_sessions():
 
 
 if __name__ == "__main__":
+    # Chat sessions, the semantic cache and query-embedding caches live in process
+    # memory, so extra workers are opt-in (WORKERS) and a client that reconnects
+    # may land on a worker without its session. Reload mode requires one worker.
+    workers = 1 if settings.debug else max(1, settings.workers)
+    
     uvicorn.run(
         "app.main:app",
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        ws="websockets",
         log_level=settings.log_level.lower()
     )
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+One-off database migrations for the RAG Chat API.
+
+Schema changes that rewrite tables or build indexes take minutes on a real
+corpus, so they run here once per deploy instead of in every worker's startup:
+
+    cd backend && python -m app.migrate
+
+Databases with embeddings stored before ingest normalized them also need a
+single backfill (pgvector >= 0.7.0):
+
+    cd backend && python -m app.migrate --normalize-embeddings
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.config import settings
+from app.services.vector_service import vector_service
+
+logger = logging.getLogger(__name__)
+
+
+async def run(normalize: bool = False):
+    """Apply pending vector storage migrations, optionally backfilling normalization first."""
+    if normalize:
+        updated = await vector_service.normalize_embeddings()
+        logger.info(f"Normalized {updated} embeddings")
+    await vector_service.migrate_vector_storage()
+
+
+def main():
+    """Apply pending vector storage migrations."""
+    parser = argparse.ArgumentParser(description="Apply vector storage migrations")
+    parser.add_argument(
+        "--normalize-embeddings",
+        action="store_true",
+        help="unit-normalize embeddings written before ingest normalized them"
+    )
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=settings.log_level_int,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(run(normalize=args.normalize_embeddings))
+    logger.info("Vector storage migrations applied")
+
+
+if __name__ == "__main__":
+    main()
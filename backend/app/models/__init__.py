@@ -1,7 +1,25 @@
 """Data models for the RAG Chat backend."""
 
-from .chat_models import *
-from .response_models import *
+from .chat_models import (
+    ChatMessage,
+    ChatSession,
+    ChatRequest,
+    StreamingResponse,
+    StreamingChunk,
+    SearchHit,
+    MessageRole,
+    MessageStatus,
+    Citation,
+)
+from .response_models import (
+    ChatResponse,
+    ErrorResponse,
+    SessionInfo,
+    HealthResponse,
+    WebSocketMessage,
+    WebSocketMessageType,
+    MessageDelta,
+)
 
 __all__ = [
     # Chat models
@@ -9,6 +27,8 @@ __all__ = [
     "ChatSession", 
     "ChatRequest",
     "StreamingResponse",
+    "StreamingChunk",
+    "SearchHit",
     "MessageRole",
     "MessageStatus",
     
@@ -19,5 +39,6 @@ __all__ = [
     "SessionInfo",
     "HealthResponse",
     "WebSocketMessage",
+    "WebSocketMessageType",
     "MessageDelta"
-]
\ No newline at end of file
+]
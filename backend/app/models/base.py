@@ -0,0 +1,19 @@
+"""
+Shared Pydantic base model with orjson serialization.
+"""
+
+import orjson
+from pydantic import BaseModel
+
+
+class FastBaseModel(BaseModel):
+    """Base model that serializes to JSON with orjson instead of Pydantic's encoder."""
+    
+    def model_dump_json(self, *, indent: int | None = None, **kwargs) -> str:
+        """Serialize the model to a JSON string using orjson."""
+        option = orjson.OPT_INDENT_2 if indent else None
+        return orjson.dumps(
+            self.model_dump(mode="python", **kwargs),
+            default=str,
+            option=option
+        ).decode()
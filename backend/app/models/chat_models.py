@@ -2,26 +2,33 @@
 Chat-related data models and Pydantic schemas.
 """
 
+from dataclasses import dataclass
 from datetime import datetime
-from enum import Enum
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, validator
+from typing import Annotated, List, Optional, Dict, Any, Literal, TYPE_CHECKING
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 
+from app.utils.clock import now_utc
 
-class MessageRole(str, Enum):
-    """Message role enumeration."""
-    USER = "user"
-    ASSISTANT = "assistant"
-    SYSTEM = "system"
+from .base import FastBaseModel
 
+if TYPE_CHECKING:
+    from .response_models import VectorSearchResult
 
-class MessageStatus(str, Enum):
-    """Message status enumeration."""
-    SENDING = "sending"
-    SENT = "sent"
-    STREAMING = "streaming"
-    COMPLETED = "completed"
-    ERROR = "error"
+# Maximum characters of chunk content carried in a citation snippet
+SNIPPET_LENGTH = 500
+
+# Messages a session keeps; older ones are dropped so long-running sessions
+# stay bounded in memory
+HISTORY_WINDOW = 500
+
+# Default number of LLM tokens coalesced into one streamed WebSocket delta
+STREAM_N_DEFAULT = 8
+
+
+# Message roles and statuses are plain strings validated as literals
+MessageRole = Literal["user", "assistant", "system"]
+
+MessageStatus = Literal["sending", "sent", "streaming", "completed", "error"]
 
 
 class Citation(BaseModel):
@@ -31,85 +38,101 @@ class Citation(BaseModel):
     source_file_url: str = Field(..., description="URL to access the source file")
     source_file_name: str = Field(..., description="Name of the source file")
     content_snippet: str = Field(..., description="Relevant content snippet")
-    relevance_score: Optional[float] = Field(None, description="Relevance score (0-1)")
+    relevance_score: Optional[Annotated[float, Field(ge=0.0, le=1.0)]] = Field(None, description="Relevance score (0-1)")
     page_number: Optional[int] = Field(None, description="Page number in the document")
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
     
-    @validator('relevance_score')
-    def validate_relevance_score(cls, v):
-        if v is not None and (v < 0 or v > 1):
-            raise ValueError('Relevance score must be between 0 and 1')
-        return v
-
-
-class ChatMessage(BaseModel):
+    @classmethod
+    def from_search_result(cls, result: "VectorSearchResult") -> "Citation":
+        """Build a citation from an already-validated search result without re-validating."""
+        content = result.content
+        return cls.model_construct(
+            id=result.id,
+            source_file_id=result.source_file_id,
+            source_file_url=result.source_file_url,
+            source_file_name=result.source_file_name,
+            content_snippet=f"{content[:SNIPPET_LENGTH]}..." if len(content) > SNIPPET_LENGTH else content,
+            relevance_score=result.certainty,
+            page_number=result.page_number,
+            metadata=result.metadata
+        )
+
+
+class ChatMessage(FastBaseModel):
     """Chat message model."""
     id: str = Field(..., description="Unique message identifier")
     role: MessageRole = Field(..., description="Message role")
     content: str = Field(..., description="Message content")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Message timestamp")
-    status: MessageStatus = Field(default=MessageStatus.SENT, description="Message status")
+    timestamp: datetime = Field(default_factory=now_utc, description="Message timestamp")
+    status: MessageStatus = Field(default="sent", description="Message status")
     citations: List[Citation] = Field(default_factory=list, description="Source citations")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
-class ChatSession(BaseModel):
+class ChatSession(FastBaseModel):
     """Chat session model."""
     id: str = Field(..., description="Unique session identifier")
     messages: List[ChatMessage] = Field(default_factory=list, description="Session messages")
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="Session creation time")
-    updated_at: datetime = Field(default_factory=datetime.utcnow, description="Last update time")
+    created_at: datetime = Field(default_factory=now_utc, description="Session creation time")
+    updated_at: datetime = Field(default_factory=now_utc, description="Last update time")
     title: Optional[str] = Field(None, description="Session title")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Session metadata")
     
+    def model_post_init(self, __context: Any) -> None:
+        """Trim any initial messages to the last HISTORY_WINDOW."""
+        del self.messages[:-HISTORY_WINDOW]
+    
     def add_message(self, message: ChatMessage) -> None:
-        """Add a message to the session."""
+        """Add a message to the session, dropping the oldest beyond HISTORY_WINDOW."""
         self.messages.append(message)
-        self.updated_at = datetime.utcnow()
+        del self.messages[:-HISTORY_WINDOW]
+        self.updated_at = now_utc()
+    
+    def add_messages(self, messages: List[ChatMessage]) -> None:
+        """Add several messages to the session with a single update stamp."""
+        self.messages.extend(messages)
+        del self.messages[:-HISTORY_WINDOW]
+        self.updated_at = now_utc()
+    
+    def recent_messages(self, limit: int) -> List[ChatMessage]:
+        """Return the last `limit` messages as a new list."""
+        return self.messages[-limit:] if limit > 0 else []
     
     def get_conversation_history(self, limit: Optional[int] = None) -> List[Dict[str, str]]:
-        """Get conversation history formatted for LLM context."""
+        """
+        Get conversation history formatted for LLM context.
+        
+        With no limit this is every message the session still holds, i.e. at
+        most the last HISTORY_WINDOW.
+        """
         messages = self.messages[-limit:] if limit else self.messages
         return [
             {
-                "role": msg.role.value,
+                "role": msg.role,
                 "content": msg.content
             }
             for msg in messages
-            if msg.role in [MessageRole.USER, MessageRole.ASSISTANT]
+            if msg.role in ("user", "assistant")
         ]
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
 class ChatRequest(BaseModel):
     """Request model for chat endpoints."""
-    message: str = Field(..., min_length=1, max_length=5000, description="User message")
+    message: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=5000)] = Field(..., description="User message")
     session_id: Optional[str] = Field(None, description="Session identifier")
     model: Optional[str] = Field(None, description="LLM model to use")
     provider: Optional[str] = Field(None, description="LLM provider")
     max_tokens: Optional[int] = Field(None, ge=1, le=4096, description="Maximum response tokens")
     temperature: Optional[float] = Field(None, ge=0.0, le=2.0, description="Response temperature")
     stream: bool = Field(default=True, description="Enable streaming response")
+    stream_n: int = Field(default=STREAM_N_DEFAULT, ge=1, le=64, description="Tokens coalesced per streamed delta")
     include_citations: bool = Field(default=True, description="Include source citations")
-    
-    @validator('message')
-    def validate_message(cls, v):
-        if not v.strip():
-            raise ValueError('Message cannot be empty')
-        return v.strip()
 
 
 class StreamingResponse(BaseModel):
     """Model for streaming response chunks."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     session_id: str = Field(..., description="Session identifier")
     message_id: str = Field(..., description="Message identifier")
     content_delta: str = Field(..., description="Incremental content")
@@ -120,6 +143,8 @@ class StreamingResponse(BaseModel):
 
 class MessageDelta(BaseModel):
     """WebSocket message delta for streaming."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     id: str = Field(..., description="Message identifier")
     content: str = Field(..., description="Content delta")
     is_complete: bool = Field(default=False, description="Whether message is complete")
@@ -128,9 +153,38 @@ class MessageDelta(BaseModel):
     usage: Optional[Dict[str, Any]] = Field(None, description="Token usage statistics")
 
 
-class StreamingChunk(BaseModel):
-    """Individual streaming chunk from LLM."""
-    content: str = Field(..., description="Text content chunk")
-    model: str = Field(..., description="Model used for generation")
-    finish_reason: Optional[str] = Field(None, description="Reason for completion (stop, error, etc.)")
-    usage: Optional[Dict[str, Any]] = Field(None, description="Token usage statistics")
+@dataclass(slots=True)
+class StreamingChunk:
+    """Individual streaming chunk from LLM (built per token, so not validated)."""
+    content: str  # Text content chunk
+    model: str  # Model used for generation
+    finish_reason: Optional[str] = None  # Reason for completion (stop, error, etc.)
+    usage: Optional[Dict[str, Any]] = None  # Token usage statistics
+
+
+@dataclass(slots=True)
+class SearchHit:
+    """Single vector search result (built per row, so not validated)."""
+    content: str  # Chunk text
+    source_file_id: str  # Drive file identifier
+    source_file_url: str  # Drive web view link
+    source_file_name: str  # Source file name
+    chunk_index: int  # Chunk identifier within the corpus
+    section_title: Optional[str]  # Section heading the chunk belongs to
+    relevance_score: float  # Similarity to the query
+    file_type: str = ""  # Not returned by the search function yet
+    created_at: str = ""  # Not returned by the search function yet
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict in the shape similarity_search used to return."""
+        return {
+            "content": self.content,
+            "source_file_id": self.source_file_id,
+            "source_file_url": self.source_file_url,
+            "source_file_name": self.source_file_name,
+            "chunk_index": self.chunk_index,
+            "section_title": self.section_title,
+            "file_type": self.file_type,
+            "created_at": self.created_at,
+            "relevance_score": self.relevance_score
+        }
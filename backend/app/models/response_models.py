@@ -3,103 +3,102 @@ API response models and WebSocket message schemas.
 """
 
 from datetime import datetime
-from enum import Enum
-from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional, Dict, Any, Literal, Union
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 
+from app.utils.clock import now_utc
+
+from .base import FastBaseModel
 from .chat_models import Citation, ChatMessage
-from pydantic import validator
+from .stream_structs import encode_frame
 
 
-class WebSocketMessageType(str, Enum):
-    """WebSocket message types."""
-    MESSAGE_DELTA = "message_delta"
-    MESSAGE_COMPLETE = "message_complete"
-    CITATIONS = "citations"
-    ERROR = "error"
-    SESSION_START = "session_start"
-    SESSION_END = "session_end"
-    CONNECTION_STATUS = "connection_status"
-    TYPING_START = "typing_start"
-    TYPING_STOP = "typing_stop"
+# WebSocket message types
+WebSocketMessageType = Literal[
+    "message_delta",
+    "message_complete",
+    "citations",
+    "error",
+    "session_start",
+    "session_end",
+    "connection_status",
+    "typing_start",
+    "typing_stop",
+]
 
 
-class WebSocketMessage(BaseModel):
+class WebSocketMessage(FastBaseModel):
     """WebSocket message wrapper."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     type: WebSocketMessageType = Field(..., description="Message type")
     data: Dict[str, Any] = Field(..., description="Message payload")
     session_id: Optional[str] = Field(None, description="Session identifier")
     message_id: Optional[str] = Field(None, description="Message identifier")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Message timestamp")
+    timestamp: datetime = Field(default_factory=now_utc, description="Message timestamp")
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
-
-
-class ChatResponse(BaseModel):
+    @classmethod
+    def fast_encode(
+        cls,
+        type: WebSocketMessageType,
+        data: Any,
+        session_id: Optional[str] = None,
+        message_id: Optional[str] = None
+    ) -> str:
+        """
+        Encode a frame with the same wire format without building the model.
+        
+        Hot frame types pass a payload struct from stream_structs (MessageDelta,
+        TypingData, ErrorData, ConnectionStatusData); rare types may pass a dict.
+        """
+        return encode_frame(type, data, session_id, message_id).decode()
+
+
+class ChatResponse(FastBaseModel):
     """Response model for chat completion."""
     message_id: str = Field(..., description="Generated message identifier")
     session_id: str = Field(..., description="Session identifier")
     content: str = Field(..., description="Response content")
     citations: List[Citation] = Field(default_factory=list, description="Source citations")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Response metadata")
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="Response timestamp")
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    created_at: datetime = Field(default_factory=now_utc, description="Response timestamp")
 
 
-class ErrorResponse(BaseModel):
+class ErrorResponse(FastBaseModel):
     """Error response model."""
     error: str = Field(..., description="Error message")
     code: str = Field(..., description="Error code")
     details: Optional[Dict[str, Any]] = Field(None, description="Additional error details")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Error timestamp")
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    timestamp: datetime = Field(default_factory=now_utc, description="Error timestamp")
 
 
-class SessionInfo(BaseModel):
+class SessionInfo(FastBaseModel):
     """Session information response."""
     session_id: str = Field(..., description="Session identifier")
     created_at: datetime = Field(..., description="Session creation time")
     updated_at: datetime = Field(..., description="Last update time")
     message_count: int = Field(..., description="Number of messages in session")
     title: Optional[str] = Field(None, description="Session title")
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
-class HealthResponse(BaseModel):
+class HealthResponse(FastBaseModel):
     """Health check response."""
     status: str = Field(..., description="Health status")
     version: str = Field(..., description="API version")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Health check timestamp")
+    timestamp: datetime = Field(default_factory=now_utc, description="Health check timestamp")
     services: Dict[str, str] = Field(default_factory=dict, description="Service statuses")
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
 class MessageDelta(BaseModel):
     """Message delta for streaming responses."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     id: str = Field(..., description="Message identifier")
     content: str = Field(..., description="Content delta")
     is_complete: bool = Field(default=False, description="Whether message is complete")
     citations: Optional[List[Citation]] = Field(None, description="Citations (sent when complete)")
     usage: Optional[Dict[str, Any]] = Field(None, description="Token usage statistics")
+    is_typing: Optional[bool] = Field(None, description="Typing state, set to false on completion in place of a typing_stop frame")
 
 
 class VectorSearchResult(BaseModel):
@@ -116,29 +115,14 @@ class VectorSearchResult(BaseModel):
     
     def to_citation(self) -> Citation:
         """Convert to Citation model."""
-        return Citation(
-            id=self.id,
-            source_file_id=self.source_file_id,
-            source_file_url=self.source_file_url,
-            source_file_name=self.source_file_name,
-            content_snippet=self.content[:500] + "..." if len(self.content) > 500 else self.content,
-            relevance_score=self.certainty,
-            page_number=self.page_number,
-            metadata=self.metadata
-        )
+        return Citation.from_search_result(self)
 
 
 class SearchRequest(BaseModel):
     """Vector search request."""
-    query: str = Field(..., min_length=1, description="Search query")
+    query: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)] = Field(..., description="Search query")
     limit: int = Field(default=5, ge=1, le=20, description="Number of results")
     min_certainty: float = Field(default=0.7, ge=0.0, le=1.0, description="Minimum certainty threshold")
-    
-    @validator('query')
-    def validate_query(cls, v):
-        if not v.strip():
-            raise ValueError('Query cannot be empty')
-        return v.strip()
 
 
 class SearchResponse(BaseModel):
@@ -162,25 +146,15 @@ class TypingEvent(BaseModel):
     session_id: str = Field(..., description="Session ID")
 
 
-class SessionStartEvent(BaseModel):
+class SessionStartEvent(FastBaseModel):
     """Session start event."""
     session_id: str = Field(..., description="New session ID")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    timestamp: datetime = Field(default_factory=now_utc)
 
 
-class SessionEndEvent(BaseModel):
+class SessionEndEvent(FastBaseModel):
     """Session end event."""
     session_id: str = Field(..., description="Ended session ID")
     message_count: int = Field(..., description="Total messages in session")
     duration_seconds: float = Field(..., description="Session duration")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
\ No newline at end of file
+    timestamp: datetime = Field(default_factory=now_utc)
@@ -0,0 +1,127 @@
+"""
+Streaming wire structs for the WebSocket hot path.
+
+These mirror the Pydantic streaming models but skip validation and encode
+straight to JSON bytes with msgspec. Pydantic models remain the source of
+truth for REST request validation.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+
+import msgspec
+
+from app.utils.clock import now_utc
+
+
+class MessageDelta(msgspec.Struct, omit_defaults=True):
+    """Message delta for streaming responses."""
+    id: str
+    content: str
+    is_complete: bool = False
+    citations: Optional[List[Dict[str, Any]]] = None
+    usage: Optional[Dict[str, Any]] = None
+    # False on the completion that also ends the typing indicator
+    is_typing: Optional[bool] = None
+
+
+class TypingData(msgspec.Struct):
+    """Payload for typing_start / typing_stop frames."""
+    is_typing: bool
+
+
+class ErrorData(msgspec.Struct):
+    """Payload for error frames."""
+    error: str
+    code: str
+
+
+class ConnectionStatusData(msgspec.Struct):
+    """Payload for connection_status frames."""
+    status: str
+
+
+class StreamFrame(msgspec.Struct, omit_defaults=True):
+    """WebSocket envelope matching the WebSocketMessage wire format."""
+    type: str
+    # One of the payload structs above, or a plain dict for rare frame types
+    data: Any
+    session_id: Optional[str] = None
+    message_id: Optional[str] = None
+    timestamp: datetime = msgspec.field(default_factory=now_utc)
+
+
+# Shared encoder; msgspec specializes encoding per Struct type internally
+_ENCODER = msgspec.json.Encoder()
+
+
+def encode_frame(
+    message_type: str,
+    data: Any,
+    session_id: Optional[str] = None,
+    message_id: Optional[str] = None
+) -> bytes:
+    """Encode a WebSocket frame to JSON bytes without model validation."""
+    return _ENCODER.encode(
+        StreamFrame(
+            type=message_type,
+            data=data,
+            session_id=session_id,
+            message_id=message_id
+        )
+    )
+
+
+class StaticFrame:
+    """
+    Frame whose type, payload and ids never change, encoded once.
+    
+    Only the timestamp differs between sends, so everything before its value
+    is kept as a prefix and each encode() appends a fresh timestamp.
+    """
+    
+    __slots__ = ("_head",)
+    
+    def __init__(
+        self,
+        message_type: str,
+        data: Any,
+        session_id: Optional[str] = None,
+        message_id: Optional[str] = None
+    ):
+        encoded = encode_frame(message_type, data, session_id, message_id).decode()
+        # timestamp is always the envelope's last field
+        self._head = encoded[:encoded.rindex('"timestamp":') + len('"timestamp":')]
+    
+    def encode(self) -> str:
+        """Return the frame as a JSON string stamped with the current time."""
+        return self._head + _ENCODER.encode(now_utc()).decode() + "}"
+
+
+class DeltaFrame:
+    """
+    message_delta frame template for one streamed message.
+    
+    Only the content and timestamp change between tokens, so the envelope is
+    encoded once around a placeholder and each encode() splices in the
+    JSON-escaped content and a fresh timestamp.
+    """
+    
+    __slots__ = ("_head", "_tail")
+    
+    _PLACEHOLDER = '"\\u0000"'
+    
+    def __init__(self, message_id: str, session_id: Optional[str] = None):
+        encoded = encode_frame(
+            "message_delta", MessageDelta(id=message_id, content="\x00"), session_id, message_id
+        ).decode()
+        self._head, tail = encoded.split(self._PLACEHOLDER, 1)
+        # timestamp is always the envelope's last field
+        self._tail = tail[:tail.rindex('"timestamp":') + len('"timestamp":')]
+    
+    def encode(self, content: str) -> str:
+        """Return a delta frame carrying `content` as a JSON string."""
+        return (
+            self._head + _ENCODER.encode(content).decode()
+            + self._tail + _ENCODER.encode(now_utc()).decode() + "}"
+        )
@@ -5,16 +5,223 @@ This service handles citation extraction, formatting, and management
 for retrieved documents and AI responses.
 """
 
+import heapq
 import logging
 import re
+from collections import Counter
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
 
+# Import pyahocorasick with fallback
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+def _relevance(citation: Dict[str, Any]) -> float:
+    """Relevance score of a citation, treating a missing score as 0.0."""
+    return citation.get("relevance_score", 0.0)
+
+# Words of 3+ characters considered as query terms; any non-word character
+# (including Unicode quotes and dashes) separates them
+_QUERY_TERM_RE = re.compile(r'\b\w{3,}\b')
+
+# Common stop words excluded from query terms
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have',
+    'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
+    'what', 'when', 'where', 'who', 'why', 'how'
+})
+
+
+@lru_cache(maxsize=256)
+def _build_term_automaton(query_terms: Tuple[str, ...]) -> "ahocorasick.Automaton":
+    """Build (and cache per query) an Aho-Corasick automaton over the query terms."""
+    automaton = ahocorasick.Automaton()
+    for term in set(query_terms):
+        # Store the term and how many times it appears in the query
+        automaton.add_word(term, (term, query_terms.count(term)))
+    automaton.make_automaton()
+    return automaton
+
+
+def _scan_query_terms(content_lower: str, query_terms: Tuple[str, ...]) -> Tuple[List[int], Set[str]]:
+    """
+    Scan lowered content once for all query terms.
+    
+    Query terms come from _extract_query_terms and are already lowercase, so
+    neither side is case-folded again here.
+    
+    Returns:
+        Tuple of (start positions of all overlapping occurrences, terms found)
+    """
+    term_positions = []
+    found_terms = set()
+    
+    if AHOCORASICK_AVAILABLE:
+        automaton = _build_term_automaton(query_terms)
+        for end_index, (term, count) in automaton.iter(content_lower):
+            term_positions.extend([end_index - len(term) + 1] * count)
+            found_terms.add(term)
+        return term_positions, found_terms
+    
+    for term in query_terms:
+        start = 0
+        while True:
+            pos = content_lower.find(term, start)
+            if pos == -1:
+                break
+            term_positions.append(pos)
+            found_terms.add(term)
+            start = pos + 1
+    
+    return term_positions, found_terms
+
+
+def _select_kth(values: List[int], k: int) -> int:
+    """Return the k-th smallest value (0-based) via quickselect, in expected O(n)."""
+    while True:
+        # Match positions arrive roughly in order, so the middle element is a good pivot
+        pivot = values[len(values) // 2]
+        lows = [v for v in values if v < pivot]
+        if k < len(lows):
+            values = lows
+            continue
+        
+        highs = [v for v in values if v > pivot]
+        pivot_count = len(values) - len(lows) - len(highs)
+        if k < len(lows) + pivot_count:
+            return pivot
+        
+        k -= len(lows) + pivot_count
+        values = highs
+
+
+def _extract_snippet(content: str, term_positions: List[int], max_length: int = 300) -> str:
+    """
+    Extract relevant snippet from content, centered on query term matches.
+    
+    Args:
+        content: Full document content
+        term_positions: Start positions of query term matches in content
+        max_length: Maximum snippet length
+        
+    Returns:
+        Extracted snippet
+    """
+    if not content:
+        return ""
+    
+    # If content is already short enough, return as is
+    if len(content) <= max_length:
+        return content.strip()
+    
+    # Without any term matches, return beginning of content
+    if not term_positions:
+        return content[:max_length].strip() + "..."
+    
+    # Find the best center position (median of term positions)
+    center_pos = _select_kth(term_positions, len(term_positions) // 2)
+    
+    # Calculate snippet boundaries
+    start_pos = max(0, center_pos - max_length // 2)
+    end_pos = min(len(content), start_pos + max_length)
+    
+    # Adjust start if we're at the end
+    if end_pos == len(content):
+        start_pos = max(0, end_pos - max_length)
+    
+    # Try to break at word boundaries
+    snippet = content[start_pos:end_pos]
+    
+    # Clean up boundaries; searches are bounded to the 50-char edges that may be cut
+    if start_pos > 0:
+        # Find first space to avoid cutting words
+        space_pos = snippet.find(' ', 0, 50)
+        if space_pos > 0:  # Don't cut too much
+            snippet = snippet[space_pos + 1:]
+            start_pos += space_pos + 1
+    
+    if end_pos < len(content):
+        # Find last space to avoid cutting words
+        space_pos = snippet.rfind(' ', max(0, len(snippet) - 49))
+        if space_pos > len(snippet) - 50:  # Don't cut too much
+            snippet = snippet[:space_pos]
+    
+    # Add ellipsis if needed
+    prefix = "..." if start_pos > 0 else ""
+    suffix = "..." if end_pos < len(content) else ""
+    
+    return f"{prefix}{snippet.strip()}{suffix}"
+
+
+def _extract_query_terms(query: str) -> List[str]:
+    """Extract meaningful terms from query string."""
+    if not query:
+        return []
+    
+    # Extract words (3+ characters), dropping stop words
+    meaningful_terms = []
+    for match in _QUERY_TERM_RE.finditer(query.lower()):
+        word = match.group()
+        if word not in _STOP_WORDS:
+            meaningful_terms.append(word)
+            if len(meaningful_terms) == 5:  # Limit to top 5 terms
+                break
+    
+    return meaningful_terms
+
+
+@lru_cache(maxsize=256)
+def _cached_query_terms(query: str) -> Tuple[str, ...]:
+    """Tokenize a query once and reuse the terms for repeated queries."""
+    return tuple(_extract_query_terms(query))
+
+
+def _extract_page_number(doc: Dict[str, Any]) -> Optional[int]:
+    """
+    Estimate page number from the chunk index, falling back to document metadata.
+    
+    Args:
+        doc: Document with chunk_index and/or metadata
+        
+    Returns:
+        Page number if available
+    """
+    # Estimate page number based on chunk index; ids may arrive as floats or
+    # numeric strings, so coerce before the arithmetic
+    # Assuming ~2-3 chunks per page on average
+    try:
+        chunk_index = int(doc.get("chunk_index") or 0)
+    except (ValueError, TypeError):
+        chunk_index = 0
+    if chunk_index > 0:
+        return chunk_index // 2 + 1
+    
+    # Check if explicitly provided in metadata
+    metadata = doc.get("metadata")
+    if isinstance(metadata, dict):
+        # Only evaluate the page_number fallback when "page" is absent
+        page = metadata["page"] if "page" in metadata else metadata.get("page_number")
+        if page:
+            try:
+                return int(page)
+            except (ValueError, TypeError):
+                pass
+    
+    return None
+
+
 class CitationService:
     """Service for processing and managing citations from retrieved documents."""
     
+    __slots__ = ("initialized",)
+    
     def __init__(self):
         self.initialized = True
         logger.info("Citation service initialized")
@@ -36,32 +243,51 @@ class CitationService:
         """
         citations = []
         
+        # Tokenize the query once for the whole batch (and once per distinct query)
+        query_terms = _cached_query_terms(query) if query else ()
+        
         for i, doc in enumerate(documents):
             try:
+                g = doc.get
+                content = g("content", "")
+                
+                # Single scan of the lowered content feeds both the snippet and highlights
+                if query_terms and content:
+                    # Already-normalized chunks skip the lowercase copy entirely
+                    content_lower = content if content.islower() else content.lower()
+                    term_positions, found_terms = _scan_query_terms(content_lower, query_terms)
+                else:
+                    term_positions, found_terms = [], set()
+                
                 # Extract relevant snippet (limit to reasonable length)
-                content = doc.get("content", "")
-                snippet = self._extract_snippet(content, query, max_length=300)
+                snippet = _extract_snippet(content, term_positions, max_length=300)
+                
+                chunk_index = g("chunk_index", 0)
+                section_title = g("section_title", "")
+                # Top-level and metadata file_type differ only in their missing-key default
+                has_file_type = "file_type" in doc
+                file_type = doc["file_type"] if has_file_type else ""
                 
                 # Create standardized citation
                 citation = {
                     "id": f"citation_{i + 1}",
                     "index": i + 1,
-                    "source_file_id": doc.get("source_file_id", ""),
-                    "source_file_url": doc.get("source_file_url", ""),
-                    "source_file_name": doc.get("source_file_name", f"Document {i + 1}"),
+                    "source_file_id": g("source_file_id", ""),
+                    "source_file_url": g("source_file_url", ""),
+                    "source_file_name": g("source_file_name", f"Document {i + 1}"),
                     "content_snippet": snippet,
                     "full_content": content,
-                    "relevance_score": doc.get("relevance_score", 0.0),
-                    "chunk_index": doc.get("chunk_index", 0),
-                    "section_title": doc.get("section_title", ""),
-                    "file_type": doc.get("file_type", ""),
-                    "created_at": doc.get("created_at", ""),
-                    "page_number": self._extract_page_number(doc),
-                    "highlighted_terms": self._find_highlighted_terms(content, query) if query else [],
+                    "relevance_score": g("relevance_score", 0.0),
+                    "chunk_index": chunk_index,
+                    "section_title": section_title,
+                    "file_type": file_type,
+                    "created_at": g("created_at", ""),
+                    "page_number": _extract_page_number(doc),
+                    "highlighted_terms": [term for term in query_terms if term in found_terms],
                     "metadata": {
-                        "file_type": doc.get("file_type", "unknown"),
-                        "chunk_index": doc.get("chunk_index", 0),
-                        "section_title": doc.get("section_title", ""),
+                        "file_type": file_type if has_file_type else "unknown",
+                        "chunk_index": chunk_index,
+                        "section_title": section_title,
                     }
                 }
                 
@@ -74,153 +300,10 @@ class CitationService:
         logger.info(f"Processed {len(citations)} citations from {len(documents)} documents")
         return citations
     
-    def _extract_snippet(self, content: str, query: str = None, max_length: int = 300) -> str:
-        """
-        Extract relevant snippet from content, prioritizing query terms.
-        
-        Args:
-            content: Full document content
-            query: Search query to prioritize
-            max_length: Maximum snippet length
-            
-        Returns:
-            Extracted snippet
-        """
-        if not content:
-            return ""
-        
-        # If content is already short enough, return as is
-        if len(content) <= max_length:
-            return content.strip()
-        
-        # If no query, return beginning of content
-        if not query:
-            return content[:max_length].strip() + "..."
-        
-        # Find the best snippet containing query terms
-        query_terms = self._extract_query_terms(query)
-        
-        if not query_terms:
-            return content[:max_length].strip() + "..."
-        
-        # Find positions of query terms in content (case-insensitive)
-        content_lower = content.lower()
-        term_positions = []
-        
-        for term in query_terms:
-            term_lower = term.lower()
-            start = 0
-            while True:
-                pos = content_lower.find(term_lower, start)
-                if pos == -1:
-                    break
-                term_positions.append(pos)
-                start = pos + 1
-        
-        if not term_positions:
-            return content[:max_length].strip() + "..."
-        
-        # Find the best center position (median of term positions)
-        term_positions.sort()
-        center_pos = term_positions[len(term_positions) // 2]
-        
-        # Calculate snippet boundaries
-        start_pos = max(0, center_pos - max_length // 2)
-        end_pos = min(len(content), start_pos + max_length)
-        
-        # Adjust start if we're at the end
-        if end_pos == len(content):
-            start_pos = max(0, end_pos - max_length)
-        
-        # Try to break at word boundaries
-        snippet = content[start_pos:end_pos]
-        
-        # Clean up boundaries
-        if start_pos > 0:
-            # Find first space to avoid cutting words
-            space_pos = snippet.find(' ')
-            if space_pos > 0 and space_pos < 50:  # Don't cut too much
-                snippet = snippet[space_pos + 1:]
-                start_pos += space_pos + 1
-        
-        if end_pos < len(content):
-            # Find last space to avoid cutting words
-            space_pos = snippet.rfind(' ')
-            if space_pos > len(snippet) - 50:  # Don't cut too much
-                snippet = snippet[:space_pos]
-        
-        # Add ellipsis if needed
-        prefix = "..." if start_pos > 0 else ""
-        suffix = "..." if end_pos < len(content) else ""
-        
-        return f"{prefix}{snippet.strip()}{suffix}"
-    
-    def _extract_query_terms(self, query: str) -> List[str]:
-        """Extract meaningful terms from query string."""
-        if not query:
-            return []
-        
-        # Remove common stop words and short terms
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-            'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have',
-            'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
-            'what', 'when', 'where', 'who', 'why', 'how'
-        }
-        
-        # Extract words (3+ characters)
-        words = re.findall(r'\b\w{3,}\b', query.lower())
-        
-        # Filter out stop words
-        meaningful_terms = [word for word in words if word not in stop_words]
-        
-        return meaningful_terms[:5]  # Limit to top 5 terms
-    
-    def _find_highlighted_terms(self, content: str, query: str) -> List[str]:
-        """Find query terms that appear in the content for highlighting."""
-        if not query or not content:
-            return []
-        
-        query_terms = self._extract_query_terms(query)
-        content_lower = content.lower()
-        
-        found_terms = []
-        for term in query_terms:
-            if term.lower() in content_lower:
-                found_terms.append(term)
-        
-        return found_terms
-    
-    def _extract_page_number(self, doc: Dict[str, Any]) -> Optional[int]:
-        """
-        Extract page number from document metadata.
-        
-        Args:
-            doc: Document with metadata
-            
-        Returns:
-            Page number if available
-        """
-        # Try different metadata locations for page number
-        chunk_index = doc.get("chunk_index", 0)
-        
-        # Estimate page number based on chunk index
-        # Assuming ~2-3 chunks per page on average
-        if chunk_index > 0:
-            estimated_page = max(1, chunk_index // 2 + 1)
-            return estimated_page
-        
-        # Check if explicitly provided in metadata
-        metadata = doc.get("metadata", {})
-        if isinstance(metadata, dict):
-            page = metadata.get("page", metadata.get("page_number"))
-            if page:
-                try:
-                    return int(page)
-                except (ValueError, TypeError):
-                    pass
-        
-        return None
+    # Helpers live at module level; kept as static aliases for existing callers
+    _extract_snippet = staticmethod(_extract_snippet)
+    _extract_query_terms = staticmethod(_extract_query_terms)
+    _extract_page_number = staticmethod(_extract_page_number)
     
     def format_citations_for_response(
         self,
@@ -254,33 +337,24 @@ class CitationService:
         if not citations:
             return ""
         
-        formatted = []
-        for citation in citations:
-            num = citation.get("index", len(formatted) + 1)
-            name = citation.get("source_file_name", "Unknown Document")
-            page = citation.get("page_number")
-            
-            if page:
-                formatted.append(f"[{num}] {name} (p. {page})")
-            else:
-                formatted.append(f"[{num}] {name}")
-        
-        return " ".join(formatted)
+        # Walrus binds the page once per citation inside the comprehension
+        return " ".join([
+            f"[{citation.get('index', i)}] {citation.get('source_file_name', 'Unknown Document')}"
+            + (f" (p. {page})" if (page := citation.get("page_number")) else "")
+            for i, citation in enumerate(citations, 1)
+        ])
     
     def _format_inline_citations(self, citations: List[Dict[str, Any]]) -> str:
         """Format citations inline with document names."""
         if not citations:
             return ""
         
-        names = []
-        for citation in citations:
-            name = citation.get("source_file_name", "Unknown Document")
-            page = citation.get("page_number")
-            
-            if page:
-                names.append(f"{name} (p. {page})")
-            else:
-                names.append(name)
+        names = [
+            f"{citation.get('source_file_name', 'Unknown Document')} (p. {page})"
+            if (page := citation.get("page_number"))
+            else citation.get("source_file_name", "Unknown Document")
+            for citation in citations
+        ]
         
         if len(names) == 1:
             return f"(Source: {names[0]})"
@@ -315,19 +389,14 @@ class CitationService:
         if not citations:
             return []
         
-        seen = set()
-        unique_citations = []
+        # Insertion-ordered dict keeps the first citation per key; citations
+        # without the key field get a positional key so they are always kept
+        unique_citations = {}
         
-        for citation in citations:
-            key = citation.get(by_field)
-            if key and key not in seen:
-                seen.add(key)
-                unique_citations.append(citation)
-            elif not key:
-                # Keep citations without the key field
-                unique_citations.append(citation)
+        for i, citation in enumerate(citations):
+            unique_citations.setdefault(citation.get(by_field) or (None, i), citation)
         
-        return unique_citations
+        return list(unique_citations.values())
     
     def filter_citations_by_relevance(
         self,
@@ -349,17 +418,14 @@ class CitationService:
         if not citations:
             return []
         
-        # Filter by minimum score
-        filtered = [
-            citation for citation in citations
-            if citation.get("relevance_score", 0.0) >= min_score
-        ]
-        
-        # Sort by relevance score (descending)
-        filtered.sort(key=lambda x: x.get("relevance_score", 0.0), reverse=True)
-        
-        # Limit count
-        return filtered[:max_citations]
+        # Filter by minimum score and keep the top max_citations by relevance
+        # (descending, ties in original order) without sorting the full list.
+        # Missing scores count as 0.0; the caller's citations are not modified.
+        return heapq.nlargest(
+            max_citations,
+            (citation for citation in citations if _relevance(citation) >= min_score),
+            key=_relevance
+        )
     
     def get_citations_summary(self, citations: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -380,41 +446,40 @@ class CitationService:
                 "sources": []
             }
         
-        # Count unique sources
+        # Single pass: Counter for file types, running sum for scores
         unique_sources = set()
-        file_types = {}
-        scores = []
-        sources = []
+        file_types = Counter()
+        score_total = 0.0
+        score_count = 0
         
         for citation in citations:
             source_id = citation.get("source_file_id")
             if source_id:
                 unique_sources.add(source_id)
             
-            # Count file types
-            file_type = citation.get("file_type", "unknown")
-            file_types[file_type] = file_types.get(file_type, 0) + 1
+            file_types[citation.get("file_type", "unknown")] += 1
             
-            # Collect scores
             score = citation.get("relevance_score", 0.0)
             if score > 0:
-                scores.append(score)
-            
-            # Collect source info
-            source_info = {
+                score_total += score
+                score_count += 1
+        
+        sources = [
+            {
                 "name": citation.get("source_file_name", "Unknown"),
-                "type": file_type,
-                "score": score
+                "type": citation.get("file_type", "unknown"),
+                "score": citation.get("relevance_score", 0.0)
             }
-            sources.append(source_info)
+            for citation in citations
+        ]
         
-        avg_score = sum(scores) / len(scores) if scores else 0.0
+        avg_score = score_total / score_count if score_count else 0.0
         
         return {
             "total_citations": len(citations),
             "unique_sources": len(unique_sources),
             "avg_relevance_score": round(avg_score, 3),
-            "file_types": file_types,
+            "file_types": dict(file_types),
             "sources": sources
         }
 
@@ -7,8 +7,9 @@ This service provides a unified interface for different LLM providers
 
 import asyncio
 import logging
-from typing import AsyncGenerator, Dict, Any, Optional, List
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncGenerator, Dict, Any, Optional, List, Tuple
 
 from llama_index.core import Settings
 from llama_index.core.llms import LLM
@@ -22,6 +23,37 @@ from app.models.chat_models import ChatMessage, StreamingChunk
 
 logger = logging.getLogger(__name__)
 
+# System prompt for RAG, shared by every request
+_SYSTEM_PROMPT = """You are a helpful AI assistant that answers questions based on provided context documents. 
+
+Instructions:
+1. Use the provided context to answer questions accurately and thoroughly
+2. If information is not in the context, clearly state that you don't have that information
+3. Always cite specific sources when referencing information from the context
+4. Be conversational but informative
+5. If no context is provided, answer based on your general knowledge but mention this limitation
+
+"""
+
+@lru_cache(maxsize=64)
+def _build_prefix(context: str, source_names: Tuple[str, ...]) -> str:
+    """Build the system section (prompt, context and sources) of a RAG prompt."""
+    parts = [_SYSTEM_PROMPT]
+    
+    # Add context section if provided
+    if context:
+        parts.append(f"\n## Context Documents:\n{context}\n\n")
+        
+        if source_names:
+            parts.append("## Available Sources:\n")
+            parts.extend(f"[{i}] {name}\n" for i, name in enumerate(source_names, 1))
+            parts.append("\n")
+    
+    return "".join(parts)
+
+# Key order for StreamingChunk.usage
+_USAGE_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
 class LLMService:
     """Service for managing LLM providers and RAG queries."""
     
@@ -116,29 +148,44 @@ class LLMService:
             # Stream response
             response_stream = await llm.astream_complete(prompt)
             
+            counter = self.token_counter
+            usage_counts = None
+            usage = None
+            
             async for token in response_stream:
-                chunk = StreamingChunk(
-                    content=str(token.delta),
+                # Counts only move when the callback fires, so consecutive tokens
+                # share one usage dict instead of allocating a fresh one each
+                counts = (
+                    counter.prompt_llm_token_count,
+                    counter.completion_llm_token_count,
+                    counter.total_llm_token_count
+                )
+                if counts != usage_counts:
+                    usage_counts = counts
+                    usage = dict(zip(_USAGE_KEYS, counts))
+                
+                # LlamaIndex deltas are normally already str
+                delta = token.delta
+                if not isinstance(delta, str):
+                    delta = str(delta)
+                
+                yield StreamingChunk(
+                    content=delta,
                     model=model_name,
                     finish_reason=None,
-                    usage={
-                        "prompt_tokens": self.token_counter.prompt_llm_token_count,
-                        "completion_tokens": self.token_counter.completion_llm_token_count,
-                        "total_tokens": self.token_counter.total_llm_token_count
-                    }
+                    usage=usage
                 )
-                yield chunk
             
             # Final chunk with finish reason
             final_chunk = StreamingChunk(
                 content="",
                 model=model_name,
                 finish_reason="stop",
-                usage={
-                    "prompt_tokens": self.token_counter.prompt_llm_token_count,
-                    "completion_tokens": self.token_counter.completion_llm_token_count,
-                    "total_tokens": self.token_counter.total_llm_token_count
-                }
+                usage=dict(zip(_USAGE_KEYS, (
+                    counter.prompt_llm_token_count,
+                    counter.completion_llm_token_count,
+                    counter.total_llm_token_count
+                )))
             )
             yield final_chunk
             
@@ -161,82 +208,66 @@ class LLMService:
     ) -> str:
         """Build complete prompt with conversation history and RAG context."""
         
-        # System prompt for RAG
-        system_prompt = """You are a helpful AI assistant that answers questions based on provided context documents. 
-
-Instructions:
-1. Use the provided context to answer questions accurately and thoroughly
-2. If information is not in the context, clearly state that you don't have that information
-3. Always cite specific sources when referencing information from the context
-4. Be conversational but informative
-5. If no context is provided, answer based on your general knowledge but mention this limitation
-
-"""
-        
-        # Add context section if provided
-        if context:
-            system_prompt += f"\n## Context Documents:\n{context}\n\n"
-            
-            if citations:
-                system_prompt += "## Available Sources:\n"
-                for i, citation in enumerate(citations, 1):
-                    source_name = citation.get('source_file_name', f'Source {i}')
-                    system_prompt += f"[{i}] {source_name}\n"
-                system_prompt += "\n"
+        # Source names resolved up front form a hashable key for the cached prefix
+        source_names = tuple(
+            citation.get('source_file_name', f'Source {i}')
+            for i, citation in enumerate(citations, 1)
+        ) if context and citations else ()
         
         # Build conversation prompt
-        conversation = []
-        conversation.append(system_prompt)
+        conversation = [_build_prefix(context or "", source_names)]
         
         for message in messages:
-            role = message.role
-            content = message.content
-            
-            if role == "user":
-                conversation.append(f"Human: {content}")
-            elif role == "assistant":
-                conversation.append(f"Assistant: {content}")
+            if message.role == "user":
+                conversation.append(f"Human: {message.content}")
+            elif message.role == "assistant":
+                conversation.append(f"Assistant: {message.content}")
         
         # Add final human prompt
         conversation.append("Assistant:")
         
         return "\n\n".join(conversation)
     
+    async def _probe(self, provider_name: str, llm: LLM) -> Dict[str, Any]:
+        """Run a test completion against a single provider."""
+        try:
+            # Simple test completion
+            await llm.acomplete("Test")
+            return {
+                "name": provider_name,
+                "status": "healthy",
+                "model": getattr(llm, 'model', 'unknown')
+            }
+        except Exception as e:
+            return {
+                "name": provider_name,
+                "status": "error",
+                "error": str(e),
+                "model": getattr(llm, 'model', 'unknown')
+            }
+    
     async def health_check(self) -> Dict[str, Any]:
         """Check health status of all LLM providers."""
         if not self.initialized:
             return {"status": "not_initialized", "providers": []}
         
-        health_status = {
-            "status": "healthy",
-            "providers": []
-        }
+        # Probe all providers concurrently; _probe never raises
+        provider_statuses = await asyncio.gather(*[
+            self._probe(provider_name, llm)
+            for provider_name, llm in self.providers.items()
+        ])
         
-        for provider_name, llm in self.providers.items():
-            try:
-                # Simple test completion
-                test_response = await llm.acomplete("Test")
-                provider_status = {
-                    "name": provider_name,
-                    "status": "healthy",
-                    "model": getattr(llm, 'model', 'unknown')
-                }
-            except Exception as e:
-                provider_status = {
-                    "name": provider_name,
-                    "status": "error",
-                    "error": str(e),
-                    "model": getattr(llm, 'model', 'unknown')
-                }
-                health_status["status"] = "degraded"
-            
-            health_status["providers"].append(provider_status)
+        degraded = any(status["status"] == "error" for status in provider_statuses)
         
-        return health_status
+        return {
+            "status": "degraded" if degraded else "healthy",
+            "providers": list(provider_statuses)
+        }
     
     async def cleanup(self):
         """Clean up resources."""
         self.providers.clear()
+        _build_prefix.cache_clear()
         self.initialized = False
         logger.info("LLM Service cleaned up")
 
@@ -0,0 +1,114 @@
+"""
+Semantic Cache for RAG Chat API.
+
+This service caches completed RAG replies keyed by the query embedding, so a
+question close enough to one answered recently is served without running
+vector search or the LLM again.
+
+The cache is process-wide: an opening question from one session can be
+answered with the full reply generated for another. Nothing invalidates it
+when documents are re-ingested, so a reply can outlive the corpus it was
+built from by up to semantic_cache_ttl_seconds. It is off unless
+SEMANTIC_CACHE_ENABLED is set.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class CachedReply:
+    """Completed assistant reply stored in the semantic cache."""
+    content: str  # Full response text
+    citations: List[Dict[str, Any]]  # Citations sent with the response
+    usage: Optional[Dict[str, Any]]  # Token usage of the original completion
+    model: str  # Model requested for the original completion
+
+
+class SemanticCache:
+    """
+    Fixed-capacity cache of replies matched by cosine similarity.
+    
+    Query embeddings from the vector service are unit length, so similarity
+    is a single matrix-vector product over the stored rows. Entries expire
+    after ttl_seconds so answers track re-ingested documents; when full, the
+    least recently used entry is replaced.
+    """
+    
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        # (max_entries, dim) unit embeddings, allocated on first insert
+        self._embeddings: Optional[np.ndarray] = None
+        self._replies: List[Optional[CachedReply]] = [None] * max_entries
+        # Monotonic expiry per slot (0 marks an empty slot) and last hit time for LRU
+        self._expires = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self.hits = 0
+        self.misses = 0
+    
+    def lookup(self, embedding: np.ndarray, model: str) -> Optional[CachedReply]:
+        """Return the cached reply for the most similar live query, if close enough."""
+        if self._embeddings is None:
+            self.misses += 1
+            return None
+        
+        now = time.monotonic()
+        scores = self._embeddings @ embedding
+        scores[self._expires <= now] = -np.inf
+        best = int(np.argmax(scores))
+        reply = self._replies[best]
+        
+        if scores[best] < self.threshold or reply is None or reply.model != model:
+            self.misses += 1
+            return None
+        
+        self._last_used[best] = now
+        self.hits += 1
+        return reply
+    
+    def insert(self, embedding: np.ndarray, reply: CachedReply) -> None:
+        """Store a reply, reusing an expired slot or evicting the least recently used."""
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+        
+        now = time.monotonic()
+        expired = np.flatnonzero(self._expires <= now)
+        slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+        
+        self._embeddings[slot] = embedding
+        self._replies[slot] = reply
+        self._expires[slot] = now + self.ttl_seconds
+        self._last_used[slot] = now
+    
+    def clear(self) -> None:
+        """Drop all cached replies."""
+        self._embeddings = None
+        self._replies = [None] * self.max_entries
+        self._expires[:] = 0
+        self._last_used[:] = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache size and hit counters."""
+        return {
+            "size": int(np.count_nonzero(self._expires > time.monotonic())),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Global cache instance
+semantic_cache = SemanticCache(
+    max_entries=settings.semantic_cache_size,
+    threshold=settings.semantic_cache_threshold,
+    ttl_seconds=settings.semantic_cache_ttl_seconds
+)
@@ -6,119 +6,671 @@ and integrates with LlamaIndex for RAG functionality.
 """
 
 import asyncio
+import hashlib
 import logging
+import time
 from typing import List, Dict, Any, Optional, Tuple
 from contextlib import asynccontextmanager
 
+import numpy as np
 import psycopg
 import voyageai
-from llama_index.core import VectorStoreIndex, StorageContext
-from llama_index.core import Settings
+from cachetools import TTLCache
+from psycopg import sql
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
 from llama_index.core.schema import TextNode, NodeWithScore
-from pgvector.psycopg import register_vector
-from tenacity import retry, stop_after_attempt, wait_exponential
+from pgvector.psycopg import register_vector_async
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from voyageai import error as voyage_error
 
 from app.config.settings import settings
+from app.models.chat_models import SearchHit
 
 logger = logging.getLogger(__name__)
 
+# voyageai.AsyncClient keeps embed requests off the event loop; older SDKs
+# only ship the blocking client, which is run in a worker thread instead
+VOYAGE_ASYNC_AVAILABLE = hasattr(voyageai, "AsyncClient")
+
+# Query embeddings requested concurrently are coalesced into one Voyage call
+EMBED_MAX_BATCH = 64
+EMBED_FLUSH_SECONDS = 0.008
+# Maximum texts Voyage accepts in a single embed request
+VOYAGE_MAX_BATCH = 128
+# Cap on concurrent Voyage requests from this process
+VOYAGE_MAX_CONCURRENCY = 32
+# Consecutive Voyage failures that open the breaker, and how long it stays open
+BREAKER_FAIL_MAX = 5
+BREAKER_RESET_SECONDS = 30.0
+# Errors that mean Voyage itself is unavailable (transport, timeouts, 429, 5xx);
+# only these are retried and counted by the breaker. A rejected request
+# (invalid input, auth) says nothing about the service's health.
+TRANSIENT_EMBED_ERRORS = (
+    voyage_error.APIConnectionError,
+    voyage_error.Timeout,
+    voyage_error.TryAgain,
+    voyage_error.RateLimitError,
+    voyage_error.ServerError,
+    voyage_error.ServiceUnavailableError,
+    asyncio.TimeoutError,
+    OSError,
+)
+
+# Process-local cache of query embeddings keyed by model + normalized text
+QUERY_CACHE_SIZE = 10_000
+QUERY_CACHE_TTL_SECONDS = 3600
+
+# Only the columns similarity_search uses; the function already caps rows at limit.
+# %b sends the float32 query embedding in pgvector's binary format (4 bytes/dim)
+# SEARCH_COLS matches SearchHit's field order, so each row unpacks straight into a hit
+SEARCH_COLS = (
+    "content", "drive_file_id", "drive_web_view_link", "file_name",
+    "chunk_id", "section_title", "similarity"
+)
+_SEARCH_SQL_TEMPLATE = """
+    SELECT """ + ", ".join(SEARCH_COLS) + """
+    FROM search_similar_chunks({args})
+    ORDER BY similarity DESC;
+"""
+_SEARCH_SQL = _SEARCH_SQL_TEMPLATE.format(args="%b, %s")
+_FILTERED_SEARCH_SQL = _SEARCH_SQL_TEMPLATE.format(args="%b, %s, %s")
+
+# Searches above STREAM_MIN_LIMIT rows use a server-side cursor fetched in batches
+STREAM_MIN_LIMIT = 32
+STREAM_ITERSIZE = 32
+
+# HNSW (m, ef_construction, ef_search) tiers by number of embedded chunks
+_HNSW_TIERS = (
+    (10_000, (16, 64, 40)),
+    (1_000_000, (24, 128, 100)),
+)
+_HNSW_LARGEST_TIER = (32, 256, 200)
+
+def _auto_tune_hnsw(chunk_count: int) -> Tuple[int, int, int]:
+    """Pick HNSW build and search parameters for a corpus of chunk_count vectors."""
+    for max_chunks, params in _HNSW_TIERS:
+        if chunk_count < max_chunks:
+            return params
+    return _HNSW_LARGEST_TIER
+
+# Document/chunk counts in one round-trip, for stats and health checks
+_COUNTS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM documents WHERE status = 'done'),
+        (SELECT COUNT(*) FROM chunks c
+         JOIN documents d ON c.document_id = d.id
+         WHERE d.status = 'done');
+"""
+
+# Advisory lock taken by migrate_vector_storage so concurrent runs don't race
+# on the same DDL (arbitrary constant, unique to this application)
+MIGRATION_LOCK_KEY = 0x646f6373
+
+# How long cached counts are served before querying again
+COUNTS_TTL_SECONDS = 30.0
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    """Parse an extension version such as '0.7.4' for comparison."""
+    return tuple(int(part) for part in version.split(".") if part.isdigit())
+
+
+def _default_ef_search(limit: int) -> int:
+    """HNSW ef_search for a top-limit query: limit * 4, clamped to [40, 400]."""
+    return min(max(limit * 4, 40), 400)
+
+class EmbeddingUnavailableError(RuntimeError):
+    """Raised without calling Voyage while the embedding circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    
+    Opens after fail_max consecutive failures and rejects calls until
+    reset_timeout has passed; a single call is then let through as a probe
+    while the rest are still rejected, and a failed probe reopens it.
+    Callers count one failure per logical call, after their own retries.
+    """
+    
+    def __init__(self, fail_max: int = BREAKER_FAIL_MAX, reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # Whether the half-open probe call is in flight
+        self.probing = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+    
+    def check(self) -> bool:
+        """
+        Raise EmbeddingUnavailableError unless a call may go through.
+        
+        While half-open the first caller becomes the probe and gets True; it
+        must call release() once its call has finished.
+        """
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        raise EmbeddingUnavailableError(
+            f"Embedding service unavailable after {self.failures} consecutive failures"
+        )
+    
+    def release(self) -> None:
+        """End the half-open probe."""
+        self.probing = False
+    
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+    
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.fail_max:
+            self.opened_at = time.monotonic()
+
+
 class VectorService:
     """Service for vector similarity search and retrieval using PostgreSQL with pgvector."""
     
     def __init__(self):
-        self.connection: Optional[psycopg.Connection] = None
+        self.pool: Optional[AsyncConnectionPool] = None
         self.voyage_client: Optional[voyageai.Client] = None
         self.embedding_model: str = "voyage-2"
         self.embedding_dim: int = 1024
         self.initialized = False
+        # Serializes initialize() so concurrent first requests share one startup
+        self._init_lock = asyncio.Lock()
+        # Session default for HNSW search width, tuned to corpus size at startup
+        self.hnsw_ef_search: int = 100
+        # Micro-batcher for query embeddings, started in initialize()
+        self._embed_queue: Optional[asyncio.Queue] = None
+        self._embed_task: Optional[asyncio.Task] = None
+        # Query embedding cache (float32, read-only arrays) and its hit counters
+        self._query_cache: TTLCache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_SECONDS)
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # Fail fast while Voyage is down and bound concurrent requests to it
+        self._breaker = CircuitBreaker()
+        self._embed_sema = asyncio.Semaphore(VOYAGE_MAX_CONCURRENCY)
+        # (document_count, chunk_count, monotonic time) from the last counts query
+        self._counts: Optional[Tuple[int, int, float]] = None
         # Database URL - can be overridden by environment variables
         self.database_url = getattr(settings, 'database_url', "postgresql://localhost/docsearch_rag")
     
     async def initialize(self):
-        """Initialize PostgreSQL connection and VoyageAI client."""
+        """Initialize PostgreSQL connection and VoyageAI client once, even under concurrent callers."""
+        if self.initialized:
+            return
+        
+        async with self._init_lock:
+            # Another caller may have finished initializing while we waited
+            if self.initialized:
+                return
+            await self._initialize()
+    
+    async def _initialize(self):
+        """Open the pool and VoyageAI client; callers hold _init_lock."""
         try:
-            # Initialize PostgreSQL connection
-            self.connection = psycopg.connect(self.database_url)
-            register_vector(self.connection)
-            
-            # Test connection by querying version
-            with self.connection.cursor() as cur:
-                cur.execute("SELECT version();")
-                db_version = cur.fetchone()[0]
-                logger.info(f"Connected to PostgreSQL: {db_version[:50]}...")
-                
-                # Check if pgvector is available
-                cur.execute("SELECT extname FROM pg_extension WHERE extname = 'vector';")
-                if not cur.fetchone():
-                    raise ConnectionError("pgvector extension not found in database")
+            # Test connection by querying version; pooled connections need the
+            # pgvector types, so confirm the extension before opening the pool
+            async with await psycopg.AsyncConnection.connect(self.database_url) as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute("SELECT version();")
+                    db_version = (await cur.fetchone())[0]
+                    logger.info(f"Connected to PostgreSQL: {db_version[:50]}...")
                     
-                logger.info("pgvector extension confirmed")
+                    # Check if pgvector is available
+                    await cur.execute("SELECT extname FROM pg_extension WHERE extname = 'vector';")
+                    if not await cur.fetchone():
+                        raise ConnectionError("pgvector extension not found in database")
+                        
+                    logger.info("pgvector extension confirmed")
+                    
+                    # Verify our schema exists, stores the configured vector type,
+                    # and is backed by an HNSW index
+                    await self._verify_schema(cur)
+                    await self._check_embedding_type(cur)
+                    await self._check_hnsw_index(cur)
+            
+            # Initialize PostgreSQL connection pool
+            self.pool = AsyncConnectionPool(
+                self.database_url,
+                min_size=settings.db_pool_min,
+                max_size=settings.db_pool_max,
+                configure=self._configure_connection,
+                open=False
+            )
+            await self.pool.open(wait=True)
             
             # Initialize VoyageAI client
             voyage_api_key = getattr(settings, 'voyage_api_key', None)
             if voyage_api_key:
-                self.voyage_client = voyageai.Client(api_key=voyage_api_key)
+                client_cls = voyageai.AsyncClient if VOYAGE_ASYNC_AVAILABLE else voyageai.Client
+                self.voyage_client = client_cls(api_key=voyage_api_key)
+                self._embed_queue = asyncio.Queue()
+                self._embed_task = asyncio.create_task(self._run_embed_batcher())
                 logger.info("VoyageAI client initialized")
             else:
                 logger.warning("No VoyageAI API key provided for embeddings")
             
-            # Verify our schema exists
-            await self._verify_schema()
-            
             self.initialized = True
             logger.info("Vector service initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize vector service: {e}")
-            if self.connection:
-                self.connection.close()
-                self.connection = None
+            if self._embed_task:
+                self._embed_task.cancel()
+                self._embed_task = None
+                self._embed_queue = None
+            if self.pool:
+                await self.pool.close()
+                self.pool = None
             raise
     
-    async def _verify_schema(self):
+    async def _configure_connection(self, conn: psycopg.AsyncConnection) -> None:
+        """Register pgvector types and the HNSW search width on a pooled connection."""
+        await register_vector_async(conn)
+        await conn.execute(
+            "SELECT set_config('hnsw.ef_search', %s, false);",
+            (str(self.hnsw_ef_search),)
+        )
+        # Pooled connections must be returned idle, outside a transaction
+        await conn.commit()
+    
+    async def _verify_schema(self, cur: psycopg.AsyncCursor):
         """Verify that required PostgreSQL tables exist."""
         try:
-            with self.connection.cursor() as cur:
-                # Check if our tables exist
-                cur.execute("""
-                    SELECT table_name FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
-                    AND table_name IN ('documents', 'chunks', 'embeddings');
-                """)
-                tables = [row[0] for row in cur.fetchall()]
-                
-                expected_tables = {'documents', 'chunks', 'embeddings'}
-                missing_tables = expected_tables - set(tables)
-                
-                if missing_tables:
-                    raise ConnectionError(f"Missing required tables: {missing_tables}")
-                
-                logger.info(f"Database schema verified: {', '.join(sorted(tables))}")
-                
+            # Check if our tables exist
+            await cur.execute("""
+                SELECT table_name FROM information_schema.tables 
+                WHERE table_schema = 'public' 
+                AND table_name IN ('documents', 'chunks', 'embeddings');
+            """)
+            tables = [row[0] for row in await cur.fetchall()]
+            
+            expected_tables = {'documents', 'chunks', 'embeddings'}
+            missing_tables = expected_tables - set(tables)
+            
+            if missing_tables:
+                raise ConnectionError(f"Missing required tables: {missing_tables}")
+            
+            logger.info(f"Database schema verified: {', '.join(sorted(tables))}")
+            
+            # The HNSW index is built for inner product; a cosine search function
+            # would bypass it, so flag databases that predate the schema change
+            await cur.execute("SELECT prosrc FROM pg_proc WHERE proname = 'search_similar_chunks';")
+            if not any('<#>' in row[0] for row in await cur.fetchall()):
+                logger.warning("search_similar_chunks does not rank by inner product; re-apply schema.sql")
+            
         except Exception as e:
             logger.error(f"Failed to verify schema: {e}")
             raise
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    async def _embed_text(self, text: str) -> List[float]:
-        """Generate embedding for a single text using VoyageAI."""
+    @property
+    def embedding_type(self) -> str:
+        """SQL type of the embeddings column (half precision when use_halfvec is set)."""
+        vector_type = "halfvec" if settings.use_halfvec else "vector"
+        return f"{vector_type}({self.embedding_dim})"
+    
+    async def _embedding_column_type(self, cur: psycopg.AsyncCursor) -> str:
+        """Current SQL type of embeddings.embedding, e.g. 'vector(1024)'."""
+        await cur.execute("""
+            SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = 'embeddings'::regclass AND attname = 'embedding';
+        """)
+        return (await cur.fetchone())[0]
+    
+    async def _check_embedding_type(self, cur: psycopg.AsyncCursor):
+        """Warn if embeddings.embedding doesn't match use_halfvec; search still works via casts."""
+        column_type = await self._embedding_column_type(cur)
+        if column_type != self.embedding_type:
+            logger.warning(
+                f"embeddings.embedding is {column_type} but settings expect {self.embedding_type}. "
+                "Run `python -m app.migrate` to convert it."
+            )
+    
+    async def _migrate_embedding_type(self, cur: psycopg.AsyncCursor):
+        """Convert embeddings.embedding between vector and halfvec to match settings (full table rewrite)."""
+        column_type = await self._embedding_column_type(cur)
+        target_type = self.embedding_type
+        if column_type == target_type:
+            return
+        
+        logger.info(f"Migrating embeddings.embedding from {column_type} to {target_type}")
+        
+        # ANN indexes are bound to the old type's operator class; rebuilt afterwards
+        await cur.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = 'public' AND tablename = 'embeddings'
+            AND (indexdef ILIKE '% USING hnsw %' OR indexdef ILIKE '% USING ivfflat %');
+        """)
+        for (index_name,) in await cur.fetchall():
+            await cur.execute(sql.SQL("DROP INDEX IF EXISTS {};").format(sql.Identifier(index_name)))
+        
+        await cur.execute(
+            f"ALTER TABLE embeddings ALTER COLUMN embedding TYPE {target_type} "
+            f"USING embedding::{target_type};"
+        )
+    
+    @property
+    def hnsw_ops(self) -> str:
+        """HNSW operator class; embeddings are unit-normalized, so inner product ranks like cosine."""
+        return "halfvec_ip_ops" if settings.use_halfvec else "vector_ip_ops"
+    
+    async def _hnsw_indexes(self, cur: psycopg.AsyncCursor) -> List[Tuple[str, str]]:
+        """(name, definition) of every HNSW index on embeddings."""
+        await cur.execute("""
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE schemaname = 'public' AND tablename = 'embeddings'
+            AND indexdef ILIKE '% USING hnsw %';
+        """)
+        return await cur.fetchall()
+    
+    async def _check_hnsw_index(self, cur: psycopg.AsyncCursor):
+        """Tune ef_search to the corpus size and warn if no inner-product HNSW index exists."""
+        await cur.execute("SELECT COUNT(*) FROM embeddings;")
+        chunk_count = (await cur.fetchone())[0]
+        _, _, self.hnsw_ef_search = _auto_tune_hnsw(chunk_count)
+        
+        if any(self.hnsw_ops in index_def for _, index_def in await self._hnsw_indexes(cur)):
+            logger.info(f"HNSW index present; ef_search={self.hnsw_ef_search} for {chunk_count} chunks")
+        else:
+            # Building takes minutes on a real corpus, so it never runs on the serving path
+            logger.warning(
+                f"No {self.hnsw_ops} HNSW index on embeddings; searches scan all {chunk_count} chunks. "
+                "Run `python -m app.migrate` to build it."
+            )
+    
+    async def migrate_vector_storage(self):
+        """
+        Bring the embeddings column and its HNSW index in line with settings.
+        
+        Run once per deploy via `python -m app.migrate`, never from worker
+        startup. The transaction holds an advisory lock, so a second concurrent
+        run waits and then finds nothing left to do.
+        """
+        async with await psycopg.AsyncConnection.connect(self.database_url) as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    await cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_KEY,))
+                    # The original ivfflat cosine index can't serve the inner-product
+                    # search but is still maintained on every insert
+                    await cur.execute("DROP INDEX IF EXISTS idx_embeddings_vector;")
+                    await self._migrate_embedding_type(cur)
+                    await self._build_hnsw_index(cur)
+    
+    async def normalize_embeddings(self) -> int:
+        """
+        Unit-normalize embeddings stored before ingest normalized them.
+        
+        One-off backfill via `python -m app.migrate --normalize-embeddings`;
+        rows already within 1e-3 of unit length are left untouched, so a
+        repeat run rewrites nothing. Returns the number of rows updated.
+        """
+        async with await psycopg.AsyncConnection.connect(self.database_url) as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    await cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_KEY,))
+                    
+                    # l2_normalize and the halfvec l2_norm overload arrived in pgvector 0.7.0
+                    await cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+                    pgvector_version = (await cur.fetchone())[0]
+                    if _version_tuple(pgvector_version) < (0, 7, 0):
+                        raise RuntimeError(
+                            f"pgvector {pgvector_version} has no l2_normalize; upgrade to >= 0.7.0 "
+                            "or re-ingest the affected documents"
+                        )
+                    
+                    column_type = await self._embedding_column_type(cur)
+                    norm_fn = "l2_norm" if column_type.startswith("halfvec") else "vector_norm"
+                    await cur.execute(
+                        "UPDATE embeddings SET embedding = l2_normalize(embedding) "
+                        f"WHERE abs({norm_fn}(embedding) - 1) > 1e-3;"
+                    )
+                    return cur.rowcount
+    
+    async def _build_hnsw_index(self, cur: psycopg.AsyncCursor):
+        """Build the inner-product HNSW index on embeddings if missing."""
+        await cur.execute("SELECT COUNT(*) FROM embeddings;")
+        chunk_count = (await cur.fetchone())[0]
+        m, ef_construction, _ = _auto_tune_hnsw(chunk_count)
+        ops = self.hnsw_ops
+        
+        hnsw_indexes = await self._hnsw_indexes(cur)
+        if any(ops in index_def for _, index_def in hnsw_indexes):
+            logger.info("HNSW index already present")
+            return
+        
+        await cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+        pgvector_version = (await cur.fetchone())[0]
+        if _version_tuple(pgvector_version) < (0, 5, 0):
+            raise RuntimeError(f"pgvector {pgvector_version} has no HNSW support; upgrade to >= 0.5.0")
+        
+        # HNSW indexes with another operator class (e.g. cosine) can't serve <#>
+        for index_name, _ in hnsw_indexes:
+            await cur.execute(sql.SQL("DROP INDEX IF EXISTS {};").format(sql.Identifier(index_name)))
+        
+        # pgvector builds HNSW in parallel from 0.6.0; size the build so the graph
+        # stays in memory. Both settings are transaction-local.
+        if _version_tuple(pgvector_version) < (0, 6, 0):
+            logger.warning(f"pgvector {pgvector_version} builds HNSW single-threaded; upgrade to >= 0.6.0")
+        await cur.execute(
+            "SELECT set_config('max_parallel_maintenance_workers', %s, true), "
+            "set_config('maintenance_work_mem', %s, true);",
+            (str(settings.hnsw_build_workers), settings.hnsw_build_memory)
+        )
+        
+        # Without an ANN index every search is a sequential scan over all chunks
+        logger.info(
+            f"Building HNSW index (m={m}, ef_construction={ef_construction}) over {chunk_count} chunks "
+            f"with {settings.hnsw_build_workers} workers"
+        )
+        await cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_hnsw_ip ON embeddings "
+            f"USING hnsw (embedding {ops}) WITH (m = {m}, ef_construction = {ef_construction});"
+        )
+    
+    async def _embed_batch(self, texts: List[str], input_type: str) -> List[List[float]]:
+        """Embed up to VOYAGE_MAX_BATCH texts, counting one breaker failure per call once retries are spent."""
+        is_probe = self._breaker.check()
+        try:
+            embeddings = await self._embed_batch_attempts(texts, input_type)
+        except TRANSIENT_EMBED_ERRORS:
+            self._breaker.record_failure()
+            raise
+        except voyage_error.VoyageError:
+            # Voyage answered, so it is up even though it rejected this request
+            self._breaker.record_success()
+            raise
+        finally:
+            if is_probe:
+                self._breaker.release()
+        
+        self._breaker.record_success()
+        return embeddings
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential_jitter(initial=0.1, max=2),
+        retry=retry_if_exception_type(TRANSIENT_EMBED_ERRORS),
+        reraise=True
+    )
+    async def _embed_batch_attempts(self, texts: List[str], input_type: str) -> List[List[float]]:
+        """One VoyageAI embed request, retried on transient errors."""
+        async with self._embed_sema:
+            if VOYAGE_ASYNC_AVAILABLE:
+                result = await self.voyage_client.embed(
+                    texts=texts,
+                    model=self.embedding_model,
+                    input_type=input_type
+                )
+            else:
+                result = await asyncio.to_thread(
+                    self.voyage_client.embed,
+                    texts=texts,
+                    model=self.embedding_model,
+                    input_type=input_type
+                )
+        return result.embeddings
+    
+    async def _embed_texts(self, texts: List[str], input_type: str = "document") -> List[List[float]]:
+        """Generate embeddings for many texts, VOYAGE_MAX_BATCH per request."""
         if not self.voyage_client:
             raise ValueError("VoyageAI client not initialized")
         
-        result = self.voyage_client.embed(
-            texts=[text],
-            model=self.embedding_model,
-            input_type="query"  # Use query type for search queries
+        embeddings = []
+        for start in range(0, len(texts), VOYAGE_MAX_BATCH):
+            embeddings.extend(
+                await self._embed_batch(texts[start:start + VOYAGE_MAX_BATCH], input_type)
+            )
+        return embeddings
+    
+    async def _run_embed_batcher(self):
+        """Coalesce queued query embeddings into batched VoyageAI calls."""
+        loop = asyncio.get_running_loop()
+        queue = self._embed_queue
+        
+        while True:
+            batch = [await queue.get()]
+            
+            # Collect more requests until the batch fills or the window closes
+            deadline = loop.time() + EMBED_FLUSH_SECONDS
+            while len(batch) < EMBED_MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                embeddings = await self._embed_texts(
+                    [text for text, _ in batch],
+                    input_type="query"  # Use query type for search queries
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+    
+    async def _embed_text(self, text: str) -> np.ndarray:
+        """Generate embedding for a single query text, cached per normalized query."""
+        key = hashlib.sha256(f"{self.embedding_model}:{text.strip().lower()}".encode()).digest()
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            self._cache_hits += 1
+            return cached
+        
+        if not self.voyage_client or self._embed_queue is None:
+            raise ValueError("VoyageAI client not initialized")
+        
+        self._cache_misses += 1
+        future = asyncio.get_running_loop().create_future()
+        await self._embed_queue.put((text, future))
+        
+        # Unit length so inner product equals cosine similarity against the stored
+        # (also normalized) chunks. pgvector binds ndarrays directly; freeze it
+        # since it is shared via the cache.
+        embedding = np.asarray(await future, dtype=np.float32)
+        embedding /= np.linalg.norm(embedding) + 1e-12
+        embedding.flags.writeable = False
+        self._query_cache[key] = embedding
+        return embedding
+    
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Unit-normalized query embedding, shared with similarity_search via the query cache."""
+        if not self.initialized:
+            await self.initialize()
+        return await self._embed_text(query)
+    
+    async def _search_raw(
+        self,
+        query: str,
+        limit: int,
+        filters: Dict[str, Any] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Run the vector search and return the raw rows.
+        
+        Returns:
+            SEARCH_COLS tuples in descending similarity order. No score
+            threshold is applied.
+        """
+        # Generate embedding for the query while a pooled connection is acquired
+        query_embedding, conn = await asyncio.gather(
+            self._embed_text(query),
+            self.pool.getconn(),
+            return_exceptions=True
         )
-        return result.embeddings[0]
+        
+        try:
+            if isinstance(query_embedding, BaseException):
+                raise query_embedding
+            if isinstance(conn, BaseException):
+                raise conn
+            
+            # Filters go to the function's jsonb argument; the two-argument
+            # form is kept for unfiltered searches
+            if filters:
+                search_sql = _FILTERED_SEARCH_SQL
+                params = (query_embedding, limit, Jsonb(filters))
+            else:
+                search_sql = _SEARCH_SQL
+                params = (query_embedding, limit)
+            
+            # Use our PostgreSQL function for vector search
+            async with conn.cursor() as cur:
+                # Size the HNSW traversal to this query; SET LOCAL ends with the transaction.
+                # Both statements are prepared server-side on first use per pooled
+                # connection, so repeat searches skip parse/plan.
+                async with conn.transaction():
+                    await cur.execute(
+                        "SELECT set_config('hnsw.ef_search', %s, true);",
+                        (str(ef_search or _default_ef_search(limit)),),
+                        prepare=True
+                    )
+                    if limit <= STREAM_MIN_LIMIT:
+                        await cur.execute(search_sql, params, prepare=True)
+                        rows = await cur.fetchall()
+                    else:
+                        # Large result sets are pulled through a server-side cursor
+                        # in itersize batches instead of one fetchall round trip
+                        async with conn.cursor(name="search_stream") as stream_cur:
+                            stream_cur.itersize = STREAM_ITERSIZE
+                            await stream_cur.execute(search_sql, params)
+                            rows = [row async for row in stream_cur]
+        finally:
+            if not isinstance(conn, BaseException):
+                await self.pool.putconn(conn)
+        
+        return rows
     
     async def similarity_search(
         self,
         query: str,
         limit: int = 5,
         score_threshold: float = 0.7,
-        filters: Dict[str, Any] = None
-    ) -> Tuple[List[Dict[str, Any]], List[float]]:
+        filters: Dict[str, Any] = None,
+        ef_search: Optional[int] = None
+    ) -> Tuple[List[SearchHit], List[float]]:
         """
         Perform similarity search using PostgreSQL with pgvector.
         
@@ -127,53 +679,23 @@ class VectorService:
             limit: Maximum number of results
             score_threshold: Minimum similarity score
             filters: Additional filters for search
+            ef_search: HNSW candidate list size (defaults to scale with limit)
             
         Returns:
-            Tuple of (documents, scores)
+            Tuple of (hits, scores); SearchHit.to_dict() gives the legacy dict form
         """
         if not self.initialized:
             await self.initialize()
         
         try:
-            # Generate embedding for the query
-            query_embedding = await self._embed_text(query)
+            rows = await self._search_raw(query, limit, filters, ef_search)
             
-            # Use our PostgreSQL function for vector search
-            with self.connection.cursor() as cur:
-                cur.execute(
-                    "SELECT * FROM search_similar_chunks(%s, %s);",
-                    (query_embedding, limit)
-                )
-                results = cur.fetchall()
-                
-                # Extract column names
-                columns = [desc[0] for desc in cur.description]
-                
-                documents = []
-                scores = []
-                
-                for row in results:
-                    row_dict = dict(zip(columns, row))
-                    similarity_score = row_dict.get('similarity', 0.0)
-                    
-                    # Filter by score threshold
-                    if similarity_score >= score_threshold:
-                        document = {
-                            "content": row_dict.get('content', ''),
-                            "source_file_id": row_dict.get('drive_file_id', ''),
-                            "source_file_url": row_dict.get('drive_web_view_link', ''),
-                            "source_file_name": row_dict.get('file_name', ''),
-                            "chunk_index": row_dict.get('chunk_id', 0),
-                            "section_title": row_dict.get('section_title', ''),
-                            "file_type": "",  # Could add this to the function if needed
-                            "created_at": "",  # Could add this if needed
-                            "relevance_score": similarity_score
-                        }
-                        documents.append(document)
-                        scores.append(similarity_score)
-                
-                logger.info(f"Retrieved {len(documents)} documents for query: {query[:50]}...")
-                return documents, scores
+            # Rows are already in SearchHit field order; the score is the last column
+            documents = [SearchHit(*row) for row in rows if row[-1] >= score_threshold]
+            scores = [hit.relevance_score for hit in documents]
+            
+            logger.info(f"Retrieved {len(documents)} documents for query: {query[:50]}...")
+            return documents, scores
             
         except Exception as e:
             logger.error(f"Error in similarity search: {e}")
@@ -189,16 +711,27 @@ class VectorService:
             similarity_top_k=similarity_top_k
         )
     
+    async def _get_counts(self) -> Tuple[int, int]:
+        """Get (document_count, chunk_count) for finished documents, cached briefly."""
+        now = time.monotonic()
+        if self._counts is not None and now - self._counts[2] < COUNTS_TTL_SECONDS:
+            return self._counts[0], self._counts[1]
+        
+        # Both counts in one round-trip; doubles as the connectivity check
+        async with self.pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(_COUNTS_SQL)
+            doc_count, chunk_count = await cur.fetchone()
+        
+        self._counts = (doc_count or 0, chunk_count or 0, now)
+        return self._counts[0], self._counts[1]
+    
     async def get_document_count(self) -> int:
         """Get total number of documents in the PostgreSQL database."""
         if not self.initialized:
             await self.initialize()
         
         try:
-            with self.connection.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM documents WHERE status = 'done';")
-                count = cur.fetchone()[0]
-                return count or 0
+            return (await self._get_counts())[0]
         except Exception as e:
             logger.error(f"Error getting document count: {e}")
             return 0
@@ -209,14 +742,7 @@ class VectorService:
             await self.initialize()
             
         try:
-            with self.connection.cursor() as cur:
-                cur.execute("""
-                    SELECT COUNT(*) FROM chunks c 
-                    JOIN documents d ON c.document_id = d.id 
-                    WHERE d.status = 'done';
-                """)
-                count = cur.fetchone()[0]
-                return count or 0
+            return (await self._get_counts())[1]
         except Exception as e:
             logger.error(f"Error getting chunk count: {e}")
             return 0
@@ -227,14 +753,8 @@ class VectorService:
             return {"status": "not_initialized"}
         
         try:
-            # Test database connection
-            with self.connection.cursor() as cur:
-                cur.execute("SELECT 1;")
-                cur.fetchone()
-            
-            # Get basic stats
-            doc_count = await self.get_document_count()
-            chunk_count = await self.get_chunk_count()
+            # Test database connection and get basic stats
+            doc_count, chunk_count = await self._get_counts()
             
             return {
                 "status": "healthy",
@@ -243,7 +763,13 @@ class VectorService:
                 "chunk_count": chunk_count,
                 "embedding_model": self.embedding_model,
                 "embedding_dim": self.embedding_dim,
-                "voyage_client": "initialized" if self.voyage_client else "not_initialized"
+                "voyage_client": "initialized" if self.voyage_client else "not_initialized",
+                "embedding_breaker": self._breaker.state,
+                "query_cache": {
+                    "size": len(self._query_cache),
+                    "hits": self._cache_hits,
+                    "misses": self._cache_misses
+                }
             }
             
         except Exception as e:
@@ -254,10 +780,20 @@ class VectorService:
     
     async def cleanup(self):
         """Clean up resources."""
-        if self.connection:
-            self.connection.close()
+        if self._embed_task:
+            self._embed_task.cancel()
+            try:
+                await self._embed_task
+            except asyncio.CancelledError:
+                pass
+        
+        self._embed_task = None
+        self._embed_queue = None
         
-        self.connection = None
+        if self.pool:
+            await self.pool.close()
+        
+        self.pool = None
         self.voyage_client = None
         self.initialized = False
         logger.info("Vector service cleaned up")
@@ -278,26 +814,25 @@ class PostgreSQLRetriever:
             score_threshold=0.0  # Let LlamaIndex handle filtering
         )
         
-        nodes_with_scores = []
-        for doc, score in zip(documents, scores):
-            # Create TextNode with metadata
-            node = TextNode(
-                text=doc['content'],
-                metadata={
-                    'source_file_id': doc['source_file_id'],
-                    'source_file_url': doc['source_file_url'], 
-                    'source_file_name': doc['source_file_name'],
-                    'section_title': doc['section_title'],
-                    'chunk_index': doc['chunk_index'],
-                    'file_type': doc['file_type']
-                }
+        # Rows come straight from our own search, so skip pydantic validation
+        # on TextNode/NodeWithScore; model_construct still fills field defaults
+        return [
+            NodeWithScore.model_construct(
+                node=TextNode.model_construct(
+                    text=hit.content,
+                    metadata={
+                        'source_file_id': hit.source_file_id,
+                        'source_file_url': hit.source_file_url,
+                        'source_file_name': hit.source_file_name,
+                        'section_title': hit.section_title,
+                        'chunk_index': hit.chunk_index,
+                        'file_type': hit.file_type
+                    }
+                ),
+                score=score
             )
-            
-            # Create NodeWithScore
-            node_with_score = NodeWithScore(node=node, score=score)
-            nodes_with_scores.append(node_with_score)
-        
-        return nodes_with_scores
+            for hit, score in zip(documents, scores)
+        ]
 
 # Global service instance
 vector_service = VectorService()
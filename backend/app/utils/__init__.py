@@ -0,0 +1,5 @@
+"""Utility helpers for the RAG Chat backend."""
+
+from .clock import now_utc
+
+__all__ = ["now_utc"]
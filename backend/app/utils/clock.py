@@ -0,0 +1,10 @@
+"""
+UTC clock used for model and frame timestamps.
+"""
+
+from datetime import datetime, timezone
+
+
+def now_utc() -> datetime:
+    """Get the current timezone-aware UTC time."""
+    return datetime.now(timezone.utc)
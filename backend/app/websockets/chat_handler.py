@@ -2,26 +2,56 @@
 WebSocket chat handler for real-time RAG chat functionality.
 """
 
-import json
 import logging
 import asyncio
+import itertools
+import secrets
+import time
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from uuid import uuid4
+
+import orjson
 
 from app.config import settings
-from app.models import (
-    ChatMessage, MessageRole, MessageStatus, WebSocketMessage, 
-    WebSocketMessageType, MessageDelta, ChatRequest
+from app.models import ChatMessage, WebSocketMessage, WebSocketMessageType, ChatRequest
+from app.models.chat_models import STREAM_N_DEFAULT
+from app.models.stream_structs import (
+    MessageDelta, TypingData, ErrorData, ConnectionStatusData, StaticFrame, DeltaFrame
 )
 from app.websockets.session_manager import session_manager
 
+if TYPE_CHECKING:
+    from app.services.semantic_cache import CachedReply
+
 logger = logging.getLogger(__name__)
 
+# Longest a token delta waits in the coalescing buffer before it is flushed
+STREAM_FLUSH_SECONDS = 0.025
+
+# Queued by _pump_stream after the last LLM chunk
+_STREAM_END = object()
+
 router = APIRouter()
 
 
+async def _pump_stream(stream, queue: asyncio.Queue) -> None:
+    """
+    Move LLM chunks into queue, then _STREAM_END.
+    
+    The consumer waits on the queue with a timeout, which is safe to cancel,
+    unlike waiting on the LLM iterator itself. A stream error is queued for
+    the consumer to re-raise.
+    """
+    try:
+        async for chunk in stream:
+            queue.put_nowait(chunk)
+    except Exception as e:
+        queue.put_nowait(e)
+    finally:
+        queue.put_nowait(_STREAM_END)
+
+
 class ChatWebSocketHandler:
     """Handles WebSocket chat interactions."""
     
@@ -29,6 +59,20 @@ class ChatWebSocketHandler:
         self.websocket = websocket
         self.session_id = session_id
         self.is_processing = False
+        # Whether a typing_start has been sent that no frame has ended yet
+        self.is_typing = False
+        # Control frames are fixed per session; only their timestamp is re-encoded
+        self._typing_start_frame = StaticFrame("typing_start", TypingData(is_typing=True), session_id)
+        self._typing_stop_frame = StaticFrame("typing_stop", TypingData(is_typing=False), session_id)
+        self._pong_frame = StaticFrame("connection_status", ConnectionStatusData(status="pong"), session_id)
+        # Message IDs are a random per-connection prefix plus a counter, so
+        # reconnects to the same session never reuse an ID
+        self._id_prefix = f"{secrets.token_hex(8)}-"
+        self._id_counter = itertools.count(1)
+    
+    def next_message_id(self) -> str:
+        """Get a message ID unique within this session."""
+        return f"{self._id_prefix}{next(self._id_counter)}"
     
     async def handle_message(self, data: Dict[str, Any]) -> None:
         """Handle incoming WebSocket message."""
@@ -43,7 +87,7 @@ class ChatWebSocketHandler:
                 await self.send_error(f"Unknown message type: {message_type}")
                 
         except Exception as e:
-            logger.error(f"Error handling message: {e}", exc_info=True)
+            logger.error("Error handling message: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             await self.send_error(f"Failed to process message: {str(e)}")
     
     async def handle_chat_message(self, data: Dict[str, Any]) -> None:
@@ -69,6 +113,7 @@ class ChatWebSocketHandler:
                 max_tokens=message_data.get("max_tokens"),
                 temperature=message_data.get("temperature"),
                 stream=message_data.get("stream", True),
+                stream_n=message_data.get("stream_n", STREAM_N_DEFAULT),
                 include_citations=message_data.get("include_citations", True)
             )
             
@@ -76,7 +121,7 @@ class ChatWebSocketHandler:
             await self.process_chat_request(chat_request)
             
         except Exception as e:
-            logger.error(f"Error in chat message handling: {e}", exc_info=True)
+            logger.error("Error in chat message handling: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             await self.send_error(f"Failed to process chat message: {str(e)}")
     
     async def process_chat_request(self, request: ChatRequest) -> None:
@@ -92,127 +137,172 @@ class ChatWebSocketHandler:
             
             # Create user message
             user_message = ChatMessage(
-                id=str(uuid4()),
-                role=MessageRole.USER,
+                id=self.next_message_id(),
+                role="user",
                 content=request.message,
-                status=MessageStatus.SENT
+                status="sent"
             )
             
-            # Add user message to session
-            session.add_message(user_message)
-            session_manager.update_session(session)
-            
             # Send typing indicator
             await self.send_typing_start()
             
             # Create assistant message placeholder
-            assistant_message_id = str(uuid4())
+            assistant_message_id = self.next_message_id()
             assistant_message = ChatMessage(
                 id=assistant_message_id,
-                role=MessageRole.ASSISTANT,
+                role="assistant",
                 content="",
-                status=MessageStatus.STREAMING
+                status="streaming"
             )
             
             # Phase 3 - RAG functionality with LlamaIndex and Weaviate
-            await self.process_rag_response(assistant_message_id, request)
+            await self.process_rag_response(assistant_message_id, request, user_message)
             
-            # Update assistant message status
-            assistant_message.status = MessageStatus.COMPLETED
-            session.add_message(assistant_message)
+            # Record the whole turn at once; the prompt above appends the user
+            # message itself, so it does not need to be in the session earlier
+            assistant_message.status = "completed"
+            session.add_messages([user_message, assistant_message])
             session_manager.update_session(session)
             
         except Exception as e:
-            logger.error(f"Error processing chat request: {e}", exc_info=True)
+            logger.error("Error processing chat request: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             await self.send_error(f"Failed to generate response: {str(e)}")
         finally:
             self.is_processing = False
-            await self.send_typing_stop()
+            # A completed reply already carried is_typing=false
+            if self.is_typing:
+                await self.send_typing_stop()
     
-    async def process_rag_response(self, message_id: str, request: ChatRequest) -> None:
+    async def process_rag_response(
+        self,
+        message_id: str,
+        request: ChatRequest,
+        user_message: ChatMessage
+    ) -> None:
         """Process RAG response with vector search and LLM streaming."""
         try:
             # Import services
-            from app.services.vector_service import get_vector_service
-            from app.services.llm_service import get_llm_service
+            # Both services are process-wide singletons initialized at startup
+            # (and lazily on first use), so no per-turn context manager is needed
+            from app.services.vector_service import vector_service
+            from app.services.llm_service import llm_service
             from app.services.citation_service import citation_service
+            from app.services.semantic_cache import semantic_cache, CachedReply
             
             # Get conversation history
             session = session_manager.get_session(self.session_id)
-            messages = session.messages if session else []
             
-            # Convert session messages to chat messages for LLM
-            chat_messages = [
-                ChatMessage(
-                    id=msg.id,
-                    role=msg.role,
-                    content=msg.content,
-                    status=msg.status
-                )
-                for msg in messages[-10:]  # Last 10 messages for context
-            ]
+            # Session messages are already validated; the prompt only reads them.
+            # Last 10 messages for context, read from the session's bounded window
+            chat_messages = session.recent_messages(10) if session else []
             
             # Add current user message
-            user_message = ChatMessage(
-                id=str(uuid4()),
-                role=MessageRole.USER,
-                content=request.message,
-                status=MessageStatus.SENT
-            )
             chat_messages.append(user_message)
             
+            # Replies depend on the conversation so far, so only opening questions
+            # are served from (and stored in) the semantic cache
+            cache_model = request.model or ""
+            query_embedding = None
+            use_cache = settings.semantic_cache_enabled and (not session or not session.messages)
+            
             # Vector search for relevant documents
-            async with get_vector_service() as vector_service:
-                documents, scores = await vector_service.similarity_search(
-                    query=request.message,
-                    limit=5,
-                    score_threshold=0.6
-                )
+            if use_cache:
+                try:
+                    query_embedding = await vector_service.embed_query(request.message)
+                except Exception as e:
+                    logger.warning("Semantic cache skipped, query embedding failed: %s", e)
+                
+                cached = semantic_cache.lookup(query_embedding, cache_model) if query_embedding is not None else None
+                if cached:
+                    await self.replay_cached_reply(message_id, cached)
+                    return
             
-            # Process citations
+            documents, scores = await vector_service.similarity_search(
+                query=request.message,
+                limit=5,
+                score_threshold=0.6
+            )
+            
+            # Process citations; the citation service works on plain dicts
             citations = citation_service.process_retrieved_documents(
-                documents, request.message
+                [hit.to_dict() for hit in documents], request.message
             )
             
-            # Send citations to client immediately
+            # Send citations to client immediately; this only queues the frame,
+            # so the LLM request below starts without waiting on the socket
             if citations:
-                citations_message = WebSocketMessage(
-                    type=WebSocketMessageType.CITATIONS,
-                    data={"citations": [citation for citation in citations]},
-                    session_id=self.session_id,
-                    message_id=message_id
-                )
-                await session_manager.send_to_websocket(self.websocket, citations_message)
+                await self._send_frame("citations", {"citations": citations}, message_id=message_id)
             
             # Prepare context for LLM
             context = "\n\n".join([
-                f"Source: {doc.get('source_file_name', 'Unknown')}\n{doc.get('content', '')}"
-                for doc in documents
+                f"Source: {hit.source_file_name}\n{hit.content}"
+                for hit in documents
             ])
             
-            # Stream LLM response
-            async with get_llm_service() as llm_service:
-                full_content = ""
-                
-                async for chunk in llm_service.stream_completion(
+            # Stream LLM response; each flushed delta is kept and the full
+            # reply joined once at the end
+            parts = []
+            
+            # Token deltas are coalesced into one frame per stream_n tokens, and
+            # flushed before finishing. A timer flushes a partial buffer once its
+            # oldest token has waited STREAM_FLUSH_SECONDS, even if the LLM stalls.
+            stream_n = request.stream_n
+            delta_frame = DeltaFrame(message_id, self.session_id)
+            pending = []
+            flush_deadline = None
+            
+            async def flush_pending():
+                delta_content = "".join(pending)
+                parts.append(delta_content)
+                await self.send_delta_content(delta_frame, delta_content)
+                pending.clear()
+            
+            chunks = asyncio.Queue()
+            pump = asyncio.create_task(_pump_stream(
+                llm_service.stream_completion(
                     messages=chat_messages,
                     model_name=request.model,
                     context=context,
-                    citations=[citation for citation in citations]
-                ):
+                    citations=citations
+                ),
+                chunks
+            ))
+            
+            try:
+                while True:
+                    timeout = None if flush_deadline is None else max(0.0, flush_deadline - time.monotonic())
+                    try:
+                        chunk = await asyncio.wait_for(chunks.get(), timeout)
+                    except asyncio.TimeoutError:
+                        await flush_pending()
+                        flush_deadline = None
+                        continue
+                    
+                    if chunk is _STREAM_END:
+                        # Stream ended without a finish chunk; don't drop buffered text
+                        if pending:
+                            await self.send_delta_content(delta_frame, "".join(pending))
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    
                     if chunk.content:
-                        full_content += chunk.content
-                        
-                        # Send streaming chunk
-                        delta = MessageDelta(
-                            id=message_id,
-                            content=chunk.content,
-                            is_complete=False
-                        )
-                        await self.send_message_delta(delta)
+                        if not pending:
+                            flush_deadline = time.monotonic() + STREAM_FLUSH_SECONDS
+                        pending.append(chunk.content)
+                    
+                    if pending and (chunk.finish_reason or len(pending) >= stream_n):
+                        await flush_pending()
+                        flush_deadline = None
                     
                     # Check if streaming is complete
                     if chunk.finish_reason == "stop":
+                        if query_embedding is not None and parts:
+                            semantic_cache.insert(
+                                query_embedding,
+                                CachedReply("".join(parts), citations, chunk.usage, cache_model)
+                            )
+                        
                         # Send final completion message
                         completion_delta = MessageDelta(
                             id=message_id,
@@ -226,16 +316,36 @@ class ChatWebSocketHandler:
                     elif chunk.finish_reason == "error":
                         await self.send_error(f"LLM Error: {chunk.content}")
                         break
+            finally:
+                pump.cancel()
         
         except Exception as e:
-            logger.error(f"Error in RAG processing: {e}", exc_info=True)
+            logger.error("Error in RAG processing: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             # Fallback to simulation if RAG fails
             try:
                 await self.simulate_response(message_id, request.message)
             except Exception as sim_e:
-                logger.error(f"Simulation also failed: {sim_e}", exc_info=True)
+                logger.error("Simulation also failed: %s", sim_e, exc_info=logger.isEnabledFor(logging.DEBUG))
                 await self.send_error(f"RAG processing failed: {str(e)}")
     
+    async def replay_cached_reply(self, message_id: str, reply: "CachedReply") -> None:
+        """Send a semantic-cache hit with the same frames a live response uses."""
+        if reply.citations:
+            await self._send_frame("citations", {"citations": reply.citations}, message_id=message_id)
+        
+        await self.send_message_delta(
+            MessageDelta(id=message_id, content=reply.content, is_complete=False)
+        )
+        await self.send_message_complete(
+            MessageDelta(
+                id=message_id,
+                content="",
+                is_complete=True,
+                citations=reply.citations or None,
+                usage=reply.usage
+            )
+        )
+    
     async def simulate_response(self, message_id: str, user_message: str) -> None:
         """Fallback simulation if RAG fails."""
         # Simulate response text
@@ -266,68 +376,48 @@ class ChatWebSocketHandler:
     
     async def send_message_delta(self, delta: MessageDelta) -> None:
         """Send message delta to client."""
-        message = WebSocketMessage(
-            type=WebSocketMessageType.MESSAGE_DELTA,
-            data=delta.dict(),
-            session_id=self.session_id,
-            message_id=delta.id
-        )
-        
-        await session_manager.send_to_websocket(self.websocket, message)
+        await self._send_frame("message_delta", delta, message_id=delta.id)
+    
+    async def send_delta_content(self, frame: DeltaFrame, content: str) -> None:
+        """Send a streamed content delta through the message's frame template."""
+        await session_manager.send_text_to_websocket(self.websocket, frame.encode(content))
     
     async def send_message_complete(self, delta: MessageDelta) -> None:
         """Send message completion to client."""
-        message = WebSocketMessage(
-            type=WebSocketMessageType.MESSAGE_COMPLETE,
-            data=delta.dict(),
-            session_id=self.session_id,
-            message_id=delta.id
+        if self.is_typing:
+            delta.is_typing = False
+            self.is_typing = False
+        await self._send_frame("message_complete", delta, message_id=delta.id)
+    
+    async def _send_frame(
+        self,
+        message_type: WebSocketMessageType,
+        data: Any,
+        message_id: Optional[str] = None
+    ) -> None:
+        """Encode a frame for this session with msgspec and send it as text."""
+        await session_manager.send_text_to_websocket(
+            self.websocket,
+            WebSocketMessage.fast_encode(message_type, data, self.session_id, message_id)
         )
-        
-        await session_manager.send_to_websocket(self.websocket, message)
     
     async def send_typing_start(self) -> None:
         """Send typing start indicator."""
-        message = WebSocketMessage(
-            type=WebSocketMessageType.TYPING_START,
-            data={"is_typing": True},
-            session_id=self.session_id
-        )
-        
-        await session_manager.send_to_websocket(self.websocket, message)
+        self.is_typing = True
+        await session_manager.send_text_to_websocket(self.websocket, self._typing_start_frame.encode())
     
     async def send_typing_stop(self) -> None:
         """Send typing stop indicator."""
-        message = WebSocketMessage(
-            type=WebSocketMessageType.TYPING_STOP,
-            data={"is_typing": False},
-            session_id=self.session_id
-        )
-        
-        await session_manager.send_to_websocket(self.websocket, message)
+        self.is_typing = False
+        await session_manager.send_text_to_websocket(self.websocket, self._typing_stop_frame.encode())
     
     async def send_error(self, error_message: str, code: str = "WEBSOCKET_ERROR") -> None:
         """Send error message to client."""
-        message = WebSocketMessage(
-            type=WebSocketMessageType.ERROR,
-            data={
-                "error": error_message,
-                "code": code
-            },
-            session_id=self.session_id
-        )
-        
-        await session_manager.send_to_websocket(self.websocket, message)
+        await self._send_frame("error", ErrorData(error=error_message, code=code))
     
     async def handle_ping(self) -> None:
         """Handle ping message (keepalive)."""
-        message = WebSocketMessage(
-            type=WebSocketMessageType.CONNECTION_STATUS,
-            data={"status": "pong"},
-            session_id=self.session_id
-        )
-        
-        await session_manager.send_to_websocket(self.websocket, message)
+        await session_manager.send_text_to_websocket(self.websocket, self._pong_frame.encode())
 
 
 @router.websocket("/{session_id}")
@@ -344,21 +434,21 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             # Receive message from client
             try:
                 data = await websocket.receive_text()
-                message_data = json.loads(data)
+                message_data = orjson.loads(data)
                 
                 # Handle the message
                 await handler.handle_message(message_data)
                 
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 await handler.send_error("Invalid JSON format")
             except WebSocketDisconnect:
                 break
             except Exception as e:
-                logger.error(f"WebSocket error: {e}", exc_info=True)
+                logger.error("WebSocket error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
                 await handler.send_error(f"WebSocket error: {str(e)}")
                 
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected for session {session_id}")
+        logger.info("WebSocket disconnected for session %s", session_id)
     finally:
         # Clean up
         session_manager.disconnect(websocket)
\ No newline at end of file
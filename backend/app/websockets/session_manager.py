@@ -2,75 +2,102 @@
 WebSocket session management for handling multiple concurrent connections.
 """
 
-import json
+import asyncio
+import heapq
 import logging
-from datetime import datetime
-from typing import Dict, Set, Optional
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple, Optional
 from fastapi import WebSocket, WebSocketDisconnect
 
-from app.models import ChatSession, WebSocketMessage, WebSocketMessageType
+from app.models import ChatSession, WebSocketMessage
+from app.utils.clock import now_utc
 
 logger = logging.getLogger(__name__)
 
+# Frames a WebSocket may have queued before it is treated as a stalled client
+MAX_PENDING_MESSAGES = 1024
+
 
 class SessionManager:
     """Manages WebSocket sessions and connections."""
     
     def __init__(self):
-        # Active WebSocket connections: session_id -> set of websockets
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        # Active WebSocket connections: session_id -> tuple of websockets.
+        # Tuples are replaced, never mutated, so senders iterate without copying.
+        self.active_connections: Dict[str, Tuple[WebSocket, ...]] = {}
         # Session data: session_id -> ChatSession
         self.sessions: Dict[str, ChatSession] = {}
         # WebSocket to session mapping: websocket -> session_id
         self.websocket_sessions: Dict[WebSocket, str] = {}
+        # Outbound frames per websocket, drained in order by one writer task each
+        self.send_queues: Dict[WebSocket, asyncio.Queue] = {}
+        self.writer_tasks: Dict[WebSocket, asyncio.Task] = {}
+        # Min-heap of (updated_at, session_id) for cleanup, with the stamp of each
+        # session's newest entry; older entries are skipped when popped
+        self._expiry_heap: List[Tuple[datetime, str]] = []
+        self._expiry_stamps: Dict[str, datetime] = {}
     
     async def connect(self, websocket: WebSocket, session_id: str) -> None:
         """Accept a new WebSocket connection."""
         await websocket.accept()
         
-        # Add connection to active connections
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = set()
+        # Senders enqueue and return; a slow client fills its own queue only
+        queue = asyncio.Queue(maxsize=MAX_PENDING_MESSAGES)
+        self.send_queues[websocket] = queue
+        self.writer_tasks[websocket] = asyncio.create_task(self._writer(websocket, queue))
         
-        self.active_connections[session_id].add(websocket)
+        # Add connection to active connections
+        connections = self.active_connections.get(session_id, ())
+        if websocket not in connections:
+            self.active_connections[session_id] = connections + (websocket,)
         self.websocket_sessions[websocket] = session_id
         
         # Create session if it doesn't exist
         if session_id not in self.sessions:
             self.sessions[session_id] = ChatSession(
                 id=session_id,
-                created_at=datetime.utcnow()
+                created_at=now_utc()
             )
+            self._schedule_expiry(self.sessions[session_id])
         
-        logger.info(f"WebSocket connected for session {session_id}")
+        logger.info("WebSocket connected for session %s", session_id)
         
         # Send session start event
         await self.send_to_session(
             session_id,
             WebSocketMessage(
-                type=WebSocketMessageType.SESSION_START,
-                data={"session_id": session_id, "timestamp": datetime.utcnow().isoformat()},
+                type="session_start",
+                data={"session_id": session_id, "timestamp": now_utc().isoformat()},
                 session_id=session_id
             )
         )
     
     def disconnect(self, websocket: WebSocket) -> Optional[str]:
         """Handle WebSocket disconnection."""
+        self.send_queues.pop(websocket, None)
+        writer = self.writer_tasks.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        
         session_id = self.websocket_sessions.get(websocket)
         
         if session_id:
             # Remove from active connections
             if session_id in self.active_connections:
-                self.active_connections[session_id].discard(websocket)
+                remaining = tuple(
+                    ws for ws in self.active_connections[session_id] if ws is not websocket
+                )
                 
                 # Remove session if no more connections
-                if not self.active_connections[session_id]:
+                if remaining:
+                    self.active_connections[session_id] = remaining
+                else:
                     del self.active_connections[session_id]
             
             # Remove websocket mapping
             del self.websocket_sessions[websocket]
             
-            logger.info(f"WebSocket disconnected for session {session_id}")
+            logger.info("WebSocket disconnected for session %s", session_id)
             
             return session_id
         
@@ -78,28 +105,71 @@ class SessionManager:
     
     async def send_to_websocket(self, websocket: WebSocket, message: WebSocketMessage) -> None:
         """Send message to a specific WebSocket."""
+        await self.send_text_to_websocket(websocket, message.model_dump_json())
+    
+    async def send_text_to_websocket(self, websocket: WebSocket, payload: str) -> None:
+        """Queue a pre-encoded JSON payload for a specific WebSocket."""
+        queue = self.send_queues.get(websocket)
+        if queue is None:
+            # Already disconnected (or never connected); nothing will drain it
+            logger.debug("Dropping message for disconnected WebSocket")
+            return
+        
         try:
-            await websocket.send_text(message.json())
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning(
+                "WebSocket for session %s has %d unsent messages; disconnecting slow client",
+                self.websocket_sessions.get(websocket), MAX_PENDING_MESSAGES
+            )
+            self.disconnect(websocket)
+            try:
+                await websocket.close(code=1008, reason="Send queue overflow")
+            except Exception as e:
+                logger.error("Error closing slow WebSocket: %s", e)
+    
+    async def _send_now(self, websocket: WebSocket, payload: str) -> bool:
+        """Write a payload to the socket, dropping the connection on failure."""
+        try:
+            await websocket.send_text(payload)
+            return True
         except Exception as e:
-            logger.error(f"Failed to send message to WebSocket: {e}")
+            logger.error("Failed to send message to WebSocket: %s", e)
             # Remove the failed connection
             self.disconnect(websocket)
+            return False
+    
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue) -> None:
+        """Drain one WebSocket's send queue in order until it fails or is cancelled."""
+        while await self._send_now(websocket, await queue.get()):
+            pass
+    
+    async def _send_payload(self, payload: str, websockets: Iterable[WebSocket]) -> None:
+        """Queue one already-encoded payload for every given WebSocket."""
+        await asyncio.gather(*[
+            self.send_text_to_websocket(websocket, payload)
+            for websocket in websockets
+        ])
     
     async def send_to_session(self, session_id: str, message: WebSocketMessage) -> None:
         """Send message to all WebSockets in a session."""
-        if session_id in self.active_connections:
-            # Create a copy of the set to avoid modification during iteration
-            connections = self.active_connections[session_id].copy()
-            
-            for websocket in connections:
-                await self.send_to_websocket(websocket, message)
+        # The tuple is never mutated in place, so it is safe to iterate as-is
+        connections = self.active_connections.get(session_id)
+        if connections:
+            await self._send_payload(message.model_dump_json(), connections)
     
     async def broadcast(self, message: WebSocketMessage, exclude_session: Optional[str] = None) -> None:
         """Broadcast message to all active sessions."""
-        for session_id in self.active_connections:
-            if exclude_session and session_id == exclude_session:
-                continue
-            await self.send_to_session(session_id, message)
+        # Sends can disconnect sockets and drop sessions, so take the items once
+        recipients = [
+            websocket
+            for session_id, connections in tuple(self.active_connections.items())
+            if not (exclude_session and session_id == exclude_session)
+            for websocket in connections
+        ]
+        if recipients:
+            # Serialized once and shared by every recipient
+            await self._send_payload(message.model_dump_json(), recipients)
     
     def get_session(self, session_id: str) -> Optional[ChatSession]:
         """Get session data."""
@@ -107,76 +177,101 @@ class SessionManager:
     
     def update_session(self, session: ChatSession) -> None:
         """Update session data."""
-        session.updated_at = datetime.utcnow()
+        session.updated_at = now_utc()
         self.sessions[session.id] = session
+        self._schedule_expiry(session)
+    
+    def _schedule_expiry(self, session: ChatSession) -> None:
+        """Index the session under its current updated_at for cleanup."""
+        if self._expiry_stamps.get(session.id) != session.updated_at:
+            self._expiry_stamps[session.id] = session.updated_at
+            heapq.heappush(self._expiry_heap, (session.updated_at, session.id))
     
-    def delete_session(self, session_id: str) -> bool:
+    async def delete_session(self, session_id: str) -> bool:
         """Delete a session and disconnect all WebSockets."""
-        if session_id in self.sessions:
-            # Disconnect all WebSockets for this session
-            if session_id in self.active_connections:
-                connections = self.active_connections[session_id].copy()
-                for websocket in connections:
-                    try:
-                        # Send session end event before disconnecting
-                        session_end_msg = WebSocketMessage(
-                            type=WebSocketMessageType.SESSION_END,
-                            data={
-                                "session_id": session_id,
-                                "message_count": len(self.sessions[session_id].messages),
-                                "timestamp": datetime.utcnow().isoformat()
-                            },
-                            session_id=session_id
-                        )
-                        # Note: We can't await here, so we'll send synchronously
-                        websocket.send_text(session_end_msg.json())
-                        websocket.close()
-                    except Exception as e:
-                        logger.error(f"Error closing WebSocket for session {session_id}: {e}")
-                
-                del self.active_connections[session_id]
+        if session_id not in self.sessions:
+            return False
+        
+        # Detach everything before the first await so no other task sees a
+        # half-deleted session; the sockets are closed afterwards
+        session = self.sessions.pop(session_id)
+        self._expiry_stamps.pop(session_id, None)
+        connections = self.active_connections.get(session_id, ())
+        for websocket in connections:
+            self.disconnect(websocket)
+        logger.info("Session %s deleted", session_id)
+        
+        if connections:
+            # Session end event sent to each socket before closing it
+            session_end_payload = WebSocketMessage(
+                type="session_end",
+                data={
+                    "session_id": session_id,
+                    "message_count": len(session.messages),
+                    "timestamp": now_utc().isoformat()
+                },
+                session_id=session_id
+            ).model_dump_json()
             
-            # Remove session data
-            del self.sessions[session_id]
-            logger.info(f"Session {session_id} deleted")
-            return True
+            for websocket in connections:
+                try:
+                    await websocket.send_text(session_end_payload)
+                    await websocket.close()
+                except Exception as e:
+                    logger.error("Error closing WebSocket for session %s: %s", session_id, e)
         
-        return False
+        return True
     
     def get_session_stats(self) -> Dict[str, int]:
         """Get session statistics."""
         active_sessions = len(self.active_connections)
         total_connections = sum(len(connections) for connections in self.active_connections.values())
         total_sessions = len(self.sessions)
+        queue_depths = [queue.qsize() for queue in self.send_queues.values()]
         
         return {
             "active_sessions": active_sessions,
             "total_connections": total_connections,
-            "total_sessions": total_sessions
+            "total_sessions": total_sessions,
+            "pending_messages": sum(queue_depths),
+            "max_pending_messages": max(queue_depths, default=0)
         }
     
     def cleanup_inactive_sessions(self, max_age_hours: int = 24) -> int:
-        """Clean up inactive sessions older than max_age_hours."""
-        current_time = datetime.utcnow()
-        sessions_to_remove = []
+        """
+        Clean up inactive sessions older than max_age_hours.
         
-        for session_id, session in self.sessions.items():
-            # Skip active sessions
-            if session_id in self.active_connections:
+        Only heap entries older than the cutoff are visited. Sessions touched
+        since their entry was pushed, or still connected, are re-indexed under
+        their current updated_at instead of being removed.
+        """
+        cutoff = now_utc() - timedelta(hours=max_age_hours)
+        heap = self._expiry_heap
+        stamps = self._expiry_stamps
+        kept = []
+        removed = 0
+        
+        while heap and heap[0][0] < cutoff:
+            stamp, session_id = heapq.heappop(heap)
+            if stamps.get(session_id) != stamp:
                 continue
             
-            # Check if session is too old
-            age_hours = (current_time - session.updated_at).total_seconds() / 3600
-            if age_hours > max_age_hours:
-                sessions_to_remove.append(session_id)
+            session = self.sessions.get(session_id)
+            if session is None:
+                del stamps[session_id]
+            elif session_id in self.active_connections or session.updated_at >= cutoff:
+                kept.append(session)
+            else:
+                del self.sessions[session_id]
+                del stamps[session_id]
+                removed += 1
         
-        # Remove old sessions
-        for session_id in sessions_to_remove:
-            del self.sessions[session_id]
+        for session in kept:
+            stamps[session.id] = session.updated_at
+            heapq.heappush(heap, (session.updated_at, session.id))
         
-        logger.info(f"Cleaned up {len(sessions_to_remove)} inactive sessions")
-        return len(sessions_to_remove)
-
+        logger.info("Cleaned up %d inactive sessions", removed)
+        return removed
 
 # Global session manager instance
 session_manager = SessionManager()
\ No newline at end of file
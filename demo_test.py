@@ -11,15 +11,136 @@ This script demonstrates the complete system functionality:
 Run this after starting the backend server to verify the complete system works.
 """
 
+import argparse
 import asyncio
+import functools
+import hashlib
 import json
+import os
 import sys
+import time
 from pathlib import Path
+from types import SimpleNamespace
+from typing import get_args
+
+# Project layout, resolved once
+project_root = Path(__file__).resolve().parent
+backend_path = project_root / "backend"
+frontend_path = project_root / "frontend"
+BACKEND_ENTRYPOINT = backend_path / "app" / "main.py"
 
 # Add the backend app to Python path
-backend_path = Path(__file__).parent / "backend"
 sys.path.insert(0, str(backend_path))
 
+# Key frontend files (relative to frontend_path) and their distinct directories
+FRONTEND_KEY_FILES = (
+    "src/main.ts",
+    "src/components/chat-interface.ts",
+    "src/services/websocket-client.ts",
+    "public/index.html",
+    "package.json"
+)
+FRONTEND_KEY_DIRS = frozenset(os.path.dirname(file_path) for file_path in FRONTEND_KEY_FILES)
+
+# Report separators
+SEPARATOR = "=" * 50
+WIDE_SEPARATOR = "=" * 60
+
+# Static closing text, written in one call
+DEPLOYMENT_INSTRUCTIONS = f"""{WIDE_SEPARATOR}
+🚀 DEPLOYMENT & TESTING INSTRUCTIONS
+{WIDE_SEPARATOR}
+
+📋 Prerequisites:
+   1. Set API keys in backend/.env:
+      - OPENAI_API_KEY=your_key_here
+      - ANTHROPIC_API_KEY=your_key_here (optional)
+   2. Weaviate running on localhost:8080 (or update WEAVIATE_URL)
+
+🔧 Backend Setup:
+   cd backend
+   source .venv/bin/activate
+   uvicorn app.main:app --reload
+
+🎨 Frontend Setup:
+   cd frontend
+   bun run dev
+
+🧪 Testing:
+   1. Open http://localhost:3000 for frontend
+   2. Open http://127.0.0.1:8000/docs for backend API
+   3. Check WebSocket at ws://127.0.0.1:8000/ws/{{session_id}}
+
+📱 Demo Usage:
+   1. Type a message in the chat interface
+   2. Watch for real-time streaming response
+   3. Check citation panel for source documents
+
+⚠️  Current Limitations:
+   - Requires real API keys for LLM functionality
+   - Requires populated Weaviate database for citations
+   - Production webpack build needs configuration fixes
+
+✨ System Successfully Integrated!
+"""
+
+@functools.cache
+def load_backend():
+    """
+    Import the backend modules the tests use, once, on first call.
+    
+    Kept out of module load so frontend-only runs (--skip-backend) never pay
+    for app and service construction. Raises if the backend is missing or
+    broken.
+    """
+    # A checkout without the backend fails here instead of in the import system
+    if not os.path.isfile(BACKEND_ENTRYPOINT):
+        raise FileNotFoundError(f"backend not present ({BACKEND_ENTRYPOINT} not found)")
+    
+    from app.main import app
+    from app.config.settings import settings
+    from app.services.llm_service import llm_service
+    from app.services.vector_service import vector_service
+    from app.services.citation_service import citation_service
+    from app.models.response_models import WebSocketMessage, WebSocketMessageType, MessageDelta
+    from app.models.chat_models import StreamingChunk, ChatRequest
+    from app.websockets.chat_handler import ChatWebSocketHandler
+    
+    return SimpleNamespace(
+        app=app,
+        settings=settings,
+        llm_service=llm_service,
+        vector_service=vector_service,
+        citation_service=citation_service,
+        WebSocketMessage=WebSocketMessage,
+        WebSocketMessageType=WebSocketMessageType,
+        # Literal members, unpacked once for both message type reports
+        message_types=get_args(WebSocketMessageType),
+        MessageDelta=MessageDelta,
+        StreamingChunk=StreamingChunk,
+        ChatRequest=ChatRequest,
+        ChatWebSocketHandler=ChatWebSocketHandler
+    )
+
+# Upper bound on each service health check (seconds)
+HEALTH_CHECK_TIMEOUT = 5.0
+
+# Markers of type checks that passed, keyed by a hash of the sources
+TYPE_CHECK_CACHE_DIR = frontend_path / "node_modules" / ".cache" / "demo-type-check"
+
+# Sample documents per citation batch, about one search result page
+CITATION_BATCH_SIZE = 32
+
+# Upper bound on the frontend type check once the other tests are done (seconds)
+TYPE_CHECK_TIMEOUT = 30.0
+
+async def bounded_health_check(service):
+    """Run a service health check, reporting a timeout instead of hanging."""
+    try:
+        return await asyncio.wait_for(service.health_check(), HEALTH_CHECK_TIMEOUT)
+    except asyncio.TimeoutError:
+        return {"status": f"degraded (no response within {HEALTH_CHECK_TIMEOUT:g}s)"}
+
 async def test_system_components():
     """Test all system components are properly integrated."""
     print("🧪 Testing RAG Chat System Components\n")
@@ -27,10 +148,7 @@ async def test_system_components():
     # Test 1: Backend Imports
     print("1. Testing Backend Imports...")
     try:
-        from app.main import app
-        from app.services.llm_service import llm_service
-        from app.services.vector_service import vector_service
-        from app.services.citation_service import citation_service
+        backend = load_backend()
         print("   ✅ All backend services import successfully")
     except Exception as e:
         print(f"   ❌ Backend import error: {e}")
@@ -39,12 +157,20 @@ async def test_system_components():
     # Test 2: Service Health Checks (without real connections)
     print("\n2. Testing Service Health Checks...")
     try:
-        # These will show "not_initialized" status without API keys, which is expected
-        llm_health = await llm_service.health_check()
-        vector_health = await vector_service.health_check()
+        # These will show "not_initialized" status without API keys, which is expected.
+        # The checks are independent, so run them concurrently; one failing
+        # service doesn't cancel the other
+        llm_health, vector_health = await asyncio.gather(
+            bounded_health_check(backend.llm_service),
+            bounded_health_check(backend.vector_service),
+            return_exceptions=True
+        )
         
-        print(f"   📊 LLM Service Status: {llm_health.get('status', 'unknown')}")
-        print(f"   📊 Vector Service Status: {vector_health.get('status', 'unknown')}")
+        for name, health in (("LLM", llm_health), ("Vector", vector_health)):
+            if isinstance(health, Exception):
+                print(f"   ⚠️  {name} Service health check: {health} (Expected without API keys)")
+            else:
+                print(f"   📊 {name} Service Status: {health.get('status', 'unknown')}")
         
         # Citation service is always ready
         print("   ✅ Citation Service: Ready")
@@ -55,16 +181,13 @@ async def test_system_components():
     # Test 3: WebSocket Message Types
     print("\n3. Testing WebSocket Message Models...")
     try:
-        from app.models.response_models import WebSocketMessageType, MessageDelta
-        from app.models.chat_models import StreamingChunk, ChatRequest
-        
         # Test model creation
-        chat_request = ChatRequest(message="Test message")
-        message_delta = MessageDelta(id="test", content="test content")
-        streaming_chunk = StreamingChunk(content="test", model="test-model")
+        chat_request = backend.ChatRequest(message="Test message")
+        message_delta = backend.MessageDelta(id="test", content="test content")
+        streaming_chunk = backend.StreamingChunk(content="test", model="test-model")
         
         print("   ✅ All WebSocket message models work correctly")
-        print(f"   📝 WebSocket Message Types: {list(WebSocketMessageType)}")
+        print(f"   📝 WebSocket Message Types: {backend.message_types}")
         
     except Exception as e:
         print(f"   ❌ WebSocket model error: {e}")
@@ -72,40 +195,35 @@ async def test_system_components():
     
     # Test 4: Configuration Validation
     print("\n4. Testing Configuration...")
-    try:
-        from app.config.settings import settings
-        print(f"   🌐 Host: {settings.host}:{settings.port}")
-        print(f"   🔧 Debug Mode: {settings.debug}")
-        print(f"   🔑 OpenAI Key: {'Set' if settings.openai_api_key else 'Not Set'}")
-        print(f"   🔑 Anthropic Key: {'Set' if settings.anthropic_api_key else 'Not Set'}")
-        print(f"   🗄️  Weaviate URL: {settings.weaviate_url}")
-        
-    except Exception as e:
-        print(f"   ❌ Configuration error: {e}")
+    if not check_configuration(backend.settings):
         return False
     
     # Test 5: Citation Processing
     print("\n5. Testing Citation Processing...")
     try:
-        # Test with sample documents
+        # Test with a search-sized batch of sample documents
+        sample_document = {
+            "content": "This is a sample document about AI and machine learning.",
+            "source_file_id": "doc1",
+            "source_file_url": "https://example.com/doc1.pdf",
+            "source_file_name": "AI_Guide.pdf",
+            "relevance_score": 0.95,
+            "chunk_index": 0,
+            "section_title": "Introduction",
+            "file_type": "pdf"
+        }
         sample_documents = [
-            {
-                "content": "This is a sample document about AI and machine learning.",
-                "source_file_id": "doc1",
-                "source_file_url": "https://example.com/doc1.pdf",
-                "source_file_name": "AI_Guide.pdf",
-                "relevance_score": 0.95,
-                "chunk_index": 0,
-                "section_title": "Introduction",
-                "file_type": "pdf"
-            }
+            {**sample_document, "chunk_index": i} for i in range(CITATION_BATCH_SIZE)
         ]
         
-        citations = citation_service.process_retrieved_documents(
+        start = time.perf_counter()
+        citations = backend.citation_service.process_retrieved_documents(
             sample_documents, "What is AI?"
         )
+        elapsed = time.perf_counter() - start
         
         print(f"   ✅ Processed {len(citations)} citations")
+        print(f"   ⏱️  {elapsed * 1e6 / len(sample_documents):.1f} µs per citation")
         if citations:
             print(f"   📄 Sample Citation: {citations[0]['source_file_name']}")
         
@@ -115,21 +233,34 @@ async def test_system_components():
     
     return True
 
-async def test_websocket_protocol():
+def check_configuration(settings):
+    """Print the configuration values; settings are parsed on first access."""
+    try:
+        print(f"   🌐 Host: {settings.host}:{settings.port}")
+        print(f"   🔧 Debug Mode: {settings.debug}")
+        print(f"   🔑 OpenAI Key: {'Set' if settings.openai_api_key else 'Not Set'}")
+        print(f"   🔑 Anthropic Key: {'Set' if settings.anthropic_api_key else 'Not Set'}")
+        print(f"   🗄️  Weaviate URL: {settings.weaviate_url}")
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Configuration error: {e}")
+        return False
+
+def test_websocket_protocol():
     """Test WebSocket protocol structure."""
     print("\n6. Testing WebSocket Protocol...")
     try:
-        from app.websockets.chat_handler import ChatWebSocketHandler
-        from app.models.response_models import WebSocketMessage, WebSocketMessageType
+        backend = load_backend()
         
         # Test message creation
-        test_message = WebSocketMessage(
-            type=WebSocketMessageType.MESSAGE_DELTA,
+        test_message = backend.WebSocketMessage(
+            type="message_delta",
             data={"content": "Hello", "message_id": "test-123"}
         )
         
         print("   ✅ WebSocket message protocol validated")
-        print(f"   🔄 Message Types Available: {len(list(WebSocketMessageType))}")
+        print(f"   🔄 Message Types Available: {len(backend.message_types)}")
         
         return True
         
@@ -137,43 +268,104 @@ async def test_websocket_protocol():
         print(f"   ❌ WebSocket protocol error: {e}")
         return False
 
-def test_frontend_structure():
+@functools.cache
+def type_check_marker():
+    """
+    Path of the marker recording a clean type check of the current sources.
+    
+    The name is a hash of every TypeScript source, the configs that affect
+    tsc, the lockfile and the installed compiler's package.json, so any edit
+    or dependency upgrade yields a new marker and forces a fresh check.
+    Hashed once per run, before the check starts, so the marker written on
+    success matches the sources that were checked.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    sources = sorted((frontend_path / "src").rglob("*.ts"))
+    inputs = [
+        *sources,
+        frontend_path / "tsconfig.json",
+        frontend_path / "package.json",
+        frontend_path / "bun.lockb",
+        frontend_path / "node_modules" / "typescript" / "package.json",
+    ]
+    for path in inputs:
+        digest.update(str(path.relative_to(frontend_path)).encode())
+        digest.update(path.read_bytes() if os.path.isfile(path) else b"")
+    return TYPE_CHECK_CACHE_DIR / f"tsc-{digest.hexdigest()}.ok"
+
+async def start_type_check():
+    """
+    Launch `bun run type-check` so it runs while the backend tests do.
+    
+    Returns the process, the marker path when these sources already passed,
+    or the exception if the check couldn't be started.
+    """
+    try:
+        marker = type_check_marker()
+        if os.path.isfile(marker):
+            return marker
+        
+        return await asyncio.create_subprocess_exec(
+            "bun", "run", "type-check",
+            cwd=frontend_path,
+            # Only the exit code is reported, so the output isn't buffered
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except Exception as e:
+        # Reported with the frontend results, like any other type-check failure
+        return e
+
+async def check_frontend_structure(type_check):
     """Test frontend structure and readiness."""
     print("\n7. Testing Frontend Structure...")
     
-    frontend_path = Path(__file__).parent / "frontend"
-    
     # Check key frontend files
-    key_files = [
-        "src/main.ts",
-        "src/components/chat-interface.ts",
-        "src/services/websocket-client.ts",
-        "public/index.html",
-        "package.json"
-    ]
+    # List each parent directory once; DirEntry.is_file() uses the type
+    # returned by the directory read, so no per-file stat is needed
+    existing = set()
+    for directory in FRONTEND_KEY_DIRS:
+        try:
+            with os.scandir(frontend_path / directory) as entries:
+                existing.update(
+                    os.path.join(directory, entry.name) for entry in entries if entry.is_file()
+                )
+        except OSError:
+            pass
     
     all_exist = True
-    for file_path in key_files:
-        full_path = frontend_path / file_path
-        if full_path.exists():
+    for file_path in FRONTEND_KEY_FILES:
+        if file_path in existing:
             print(f"   ✅ {file_path}")
         else:
             print(f"   ❌ Missing: {file_path}")
             all_exist = False
     
-    # Check if TypeScript compiles
+    # Check if TypeScript compiles (started by main before the backend tests)
     try:
-        import subprocess
-        result = subprocess.run(
-            ["bun", "run", "type-check"],
-            cwd=frontend_path,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
+        if isinstance(type_check, Exception):
+            raise type_check
+        
+        if isinstance(type_check, Path):
+            print("   ✅ TypeScript compilation successful (cached)")
+            return all_exist
         
-        if result.returncode == 0:
+        try:
+            await asyncio.wait_for(type_check.wait(), TYPE_CHECK_TIMEOUT)
+        except asyncio.TimeoutError:
+            type_check.kill()
+            await type_check.wait()
+            raise TimeoutError(f"type-check still running after {TYPE_CHECK_TIMEOUT:g}s")
+        
+        if type_check.returncode == 0:
             print("   ✅ TypeScript compilation successful")
+            # Best effort; a read-only checkout just re-runs the check next time
+            try:
+                marker = type_check_marker()
+                marker.parent.mkdir(parents=True, exist_ok=True)
+                marker.touch()
+            except OSError:
+                pass
         else:
             print("   ⚠️  TypeScript compilation issues (check manually)")
             
@@ -184,63 +376,44 @@ def test_frontend_structure():
 
 def print_deployment_instructions():
     """Print instructions for deploying and testing the system."""
-    print("\n" + "="*60)
-    print("🚀 DEPLOYMENT & TESTING INSTRUCTIONS")
-    print("="*60)
-    
-    print("\n📋 Prerequisites:")
-    print("   1. Set API keys in backend/.env:")
-    print("      - OPENAI_API_KEY=your_key_here")
-    print("      - ANTHROPIC_API_KEY=your_key_here (optional)")
-    print("   2. Weaviate running on localhost:8080 (or update WEAVIATE_URL)")
-    
-    print("\n🔧 Backend Setup:")
-    print("   cd backend")
-    print("   source .venv/bin/activate")
-    print("   uvicorn app.main:app --reload")
-    
-    print("\n🎨 Frontend Setup:")
-    print("   cd frontend") 
-    print("   bun run dev")
-    
-    print("\n🧪 Testing:")
-    print("   1. Open http://localhost:3000 for frontend")
-    print("   2. Open http://127.0.0.1:8000/docs for backend API")
-    print("   3. Check WebSocket at ws://127.0.0.1:8000/ws/{session_id}")
-    
-    print("\n📱 Demo Usage:")
-    print("   1. Type a message in the chat interface")
-    print("   2. Watch for real-time streaming response")
-    print("   3. Check citation panel for source documents")
-    
-    print("\n⚠️  Current Limitations:")
-    print("   - Requires real API keys for LLM functionality")
-    print("   - Requires populated Weaviate database for citations")
-    print("   - Production webpack build needs configuration fixes")
-    
-    print("\n✨ System Successfully Integrated!")
+    sys.stdout.write("\n" + DEPLOYMENT_INSTRUCTIONS)
 
-async def main():
+def parse_args(argv=None):
+    """Parse which test groups to run."""
+    parser = argparse.ArgumentParser(description="RAG Chat system integration test")
+    parser.add_argument("--skip-backend", action="store_true", help="Skip backend and WebSocket checks (no backend import)")
+    parser.add_argument("--skip-frontend", action="store_true", help="Skip frontend structure and type checks")
+    return parser.parse_args(argv)
+
+async def main(args):
     """Run all tests and provide deployment guidance."""
     print("🎯 RAG Chat System Integration Test")
-    print("="*50)
+    print(SEPARATOR)
     
-    # Run component tests
-    backend_ok = await test_system_components()
-    websocket_ok = await test_websocket_protocol() 
-    frontend_ok = test_frontend_structure()
+    # The type check is the slowest step, so it runs in the background
+    # while the backend tests execute
+    type_check = None if args.skip_frontend else await start_type_check()
     
-    # Print summary
-    print("\n" + "="*50)
-    print("📊 INTEGRATION TEST SUMMARY")
-    print("="*50)
+    # Run component tests; skipped groups count as passing
+    backend_ok = args.skip_backend or await test_system_components()
+    websocket_ok = args.skip_backend or test_websocket_protocol()
+    frontend_ok = args.skip_frontend or await check_frontend_structure(type_check)
     
-    print(f"Backend Services:  {'✅ PASS' if backend_ok else '❌ FAIL'}")
-    print(f"WebSocket Protocol: {'✅ PASS' if websocket_ok else '❌ FAIL'}")
-    print(f"Frontend Structure: {'✅ PASS' if frontend_ok else '❌ FAIL'}")
+    def status(ok, skipped):
+        return '⏭️  SKIPPED' if skipped else '✅ PASS' if ok else '❌ FAIL'
     
     overall_status = backend_ok and websocket_ok and frontend_ok
-    print(f"\nOverall Integration: {'✅ READY' if overall_status else '⚠️  NEEDS FIXES'}")
+    
+    # Print summary in one write
+    sys.stdout.write("\n".join([
+        "\n" + SEPARATOR,
+        "📊 INTEGRATION TEST SUMMARY",
+        SEPARATOR,
+        f"Backend Services:  {status(backend_ok, args.skip_backend)}",
+        f"WebSocket Protocol: {status(websocket_ok, args.skip_backend)}",
+        f"Frontend Structure: {status(frontend_ok, args.skip_frontend)}",
+        f"\nOverall Integration: {'✅ READY' if overall_status else '⚠️  NEEDS FIXES'}"
+    ]) + "\n")
     
     # Provide deployment instructions
     print_deployment_instructions()
@@ -249,7 +422,7 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        success = asyncio.run(main())
+        success = asyncio.run(main(parse_args()))
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         print("\n\n🛑 Test interrupted by user")
@@ -211,6 +211,10 @@ export class WebSocketClient {
       });
       this.emit('messageComplete', { messageId: lastMessage.id, ...data });
     }
+    // The server folds typing_stop into message_complete
+    if (data.is_typing === false) {
+      this.handleTypingStop(data);
+    }
   }
 
   private handleCitations(data: any): void {
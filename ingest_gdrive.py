@@ -15,22 +15,31 @@ Usage:
 import argparse
 import asyncio
 import hashlib
+import io
 import json
 import logging
+import multiprocessing
 import os
+import re
+import sqlite3
 import tempfile
+import threading
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import BinaryIO, Dict, List, Optional, Tuple, Any, Union
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 
+import numpy as np
 import psycopg
+from psycopg import sql
 import voyageai
 from google.auth.credentials import Credentials
 from google.oauth2.credentials import Credentials as OAuth2Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
 from markitdown import MarkItDown
 from pgvector.psycopg import register_vector
 from pydantic import field_validator
@@ -46,6 +55,38 @@ except ImportError:
     CHONKIE_AVAILABLE = False
     logging.warning("Chonkie not available, using fallback chunker")
 
+# PyMuPDF reads a PDF's text layer in C, far faster than MarkItDown's pdfminer pass
+try:
+    import pymupdf
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# The embedding model's own tokenizer (Rust, batched) gives exact chunk token counts
+try:
+    from tokenizers import Tokenizer
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    TOKENIZERS_AVAILABLE = False
+
+# voyageai.AsyncClient lets embedding batches overlap; older SDKs only ship
+# the blocking client, which is run in a worker thread instead
+VOYAGE_ASYNC_AVAILABLE = hasattr(voyageai, "AsyncClient")
+
+
+# Google-native files are exported (to PPTX) rather than downloaded as-is
+EXPORTED_MIME_TYPES = frozenset({"application/vnd.google-apps.presentation"})
+
+# Drive downloads are fetched in ranged requests of this size, each retried on its own
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_RETRIES = 3
+
+# Downloads smaller than this are kept in memory when no download_dir is set
+IN_MEMORY_DOWNLOAD_MAX = 64 * 1024 * 1024
+
+# PDFs yielding less text than this are treated as scanned and sent to MarkItDown
+MIN_PDF_TEXT_CHARS = 100
+
 
 # Configuration
 class Config(BaseSettings):
@@ -65,12 +106,27 @@ class Config(BaseSettings):
     chunk_overlap: int = 200
     embed_qps: float = 4.0
     embed_concurrency: int = 2
+    file_concurrency: int = 4
+    # Processes converting documents to markdown; defaults to one per spare core
+    conversion_workers: Optional[int] = None
+    
+    # Vector index handling for large runs
+    rebuild_index_min_files: int = 50
+    hnsw_build_workers: int = 7
+    hnsw_build_memory: str = "2GB"
+    # Per-file commits don't wait on the WAL flush; a crash loses at most the
+    # last few files, which stay unfinished and are redone on --resume
+    synchronous_commit: str = "off"
     
     # File filtering
     include_mime_types: str = "application/pdf,application/vnd.google-apps.presentation"
     
     # Paths
     download_dir: Optional[str] = None
+    # SQLite cache of embeddings by chunk text; empty string disables it
+    embedding_cache_path: str = "~/.cache/docsearch-mvp/embeddings.sqlite3"
+    # Last Google access token, reused while valid; empty string disables it
+    google_token_cache_path: str = "~/.cache/docsearch-mvp/google_token.json"
     
     # Logging
     log_level: str = "INFO"
@@ -91,8 +147,13 @@ class DriveFile:
     name: str
     mime_type: str
     modified_time: str
-    web_view_link: str
     size_bytes: Optional[int] = None
+    # Derived from the id, so list_files doesn't request it from Drive
+    web_view_link: str = ""
+    
+    def __post_init__(self):
+        if not self.web_view_link:
+            self.web_view_link = f"https://drive.google.com/file/d/{self.id}/view"
 
 
 @dataclass
@@ -111,22 +172,71 @@ class GoogleDriveClient:
     
     def __init__(self, config: Config):
         self.config = config
-        self.service = None
+        self._credentials = None
+        # Drive services sit on httplib2, which is not thread-safe, so each
+        # download thread builds its own
+        self._local = threading.local()
         self._authenticate()
     
+    @property
+    def service(self):
+        """Drive API service for the calling thread."""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self._credentials)
+            self._local.service = service
+        return service
+    
     def _authenticate(self):
         """Authenticate with Google Drive using refresh token."""
-        credentials = OAuth2Credentials(
-            token=None,
+        token, expiry = self._load_cached_token()
+        self._credentials = OAuth2Credentials(
+            token=token,
+            expiry=expiry,
             refresh_token=self.config.google_refresh_token,
             token_uri="https://oauth2.googleapis.com/token",
             client_id=self.config.google_client_id,
             client_secret=self.config.google_client_secret
         )
-        
-        self.service = build('drive', 'v3', credentials=credentials)
         logging.info("Google Drive authenticated successfully")
     
+    def _load_cached_token(self) -> Tuple[Optional[str], Optional[datetime]]:
+        """Return the cached access token and expiry if still valid for a few minutes."""
+        if not self.config.google_token_cache_path:
+            return None, None
+        try:
+            cached = json.loads(Path(self.config.google_token_cache_path).expanduser().read_text())
+            if cached['client_id'] != self.config.google_client_id:
+                return None, None
+            # google-auth compares expiry as naive UTC
+            expiry = datetime.fromisoformat(cached['expiry'])
+        except (OSError, ValueError, KeyError):
+            return None, None
+        
+        if expiry - timedelta(minutes=5) <= datetime.now(timezone.utc).replace(tzinfo=None):
+            return None, None
+        logging.debug("Reusing cached Google access token")
+        return cached['token'], expiry
+    
+    def _save_token(self):
+        """Cache the current access token so the next run can skip the refresh."""
+        credentials = self._credentials
+        if not self.config.google_token_cache_path or not credentials.token or not credentials.expiry:
+            return
+        cache_path = Path(self.config.google_token_cache_path).expanduser()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Owner-only: the file holds a live access token
+            fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'client_id': self.config.google_client_id,
+                    'token': credentials.token,
+                    'expiry': credentials.expiry.isoformat()
+                }, f)
+        except OSError as e:
+            logging.warning(f"Could not cache Google access token: {e}")
+    
     def list_files(self, max_files: Optional[int] = None) -> List[DriveFile]:
         """List files from Google Drive matching our criteria."""
         mime_filter = " or ".join([f"mimeType='{mt}'" for mt in self.config.include_mime_types])
@@ -141,7 +251,7 @@ class GoogleDriveClient:
                     q=query,
                     pageSize=min(1000, max_files - len(files) if max_files else 1000),
                     pageToken=page_token,
-                    fields="nextPageToken, files(id, name, mimeType, modifiedTime, webViewLink, size)"
+                    fields="nextPageToken, files(id, name, mimeType, modifiedTime, size)"
                 ).execute()
                 
                 batch_files = response.get('files', [])
@@ -151,7 +261,6 @@ class GoogleDriveClient:
                         name=file_data['name'],
                         mime_type=file_data['mimeType'],
                         modified_time=file_data['modifiedTime'],
-                        web_view_link=file_data['webViewLink'],
                         size_bytes=int(file_data.get('size', 0)) if file_data.get('size') else None
                     ))
                 
@@ -165,15 +274,14 @@ class GoogleDriveClient:
                 break
         
         logging.info(f"Found {len(files)} files in Google Drive")
+        self._save_token()
         return files[:max_files] if max_files else files
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def download_file(self, file: DriveFile, download_path: Path) -> bool:
-        """Download or export a file from Google Drive."""
+    def download_file(self, file: DriveFile, download_path: Path, sink: Optional[BinaryIO] = None) -> bool:
+        """Download or export a file from Google Drive to download_path, or into sink if given."""
         try:
-            download_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            if file.mime_type == "application/vnd.google-apps.presentation":
+            if file.mime_type in EXPORTED_MIME_TYPES:
                 # Export Google Slides as PPTX
                 request = self.service.files().export_media(
                     fileId=file.id,
@@ -185,9 +293,16 @@ class GoogleDriveClient:
                 request = self.service.files().get_media(fileId=file.id)
                 final_path = download_path
             
+            if sink is not None:
+                sink.seek(0)
+                sink.truncate()
+                self._stream_media(file, request, sink)
+                logging.debug(f"Downloaded {file.name} into memory")
+                return True
+            
+            download_path.parent.mkdir(parents=True, exist_ok=True)
             with open(final_path, 'wb') as f:
-                media = request.execute()
-                f.write(media)
+                self._stream_media(file, request, f)
             
             logging.debug(f"Downloaded {file.name} to {final_path}")
             return True
@@ -195,6 +310,19 @@ class GoogleDriveClient:
         except Exception as e:
             logging.error(f"Failed to download {file.name}: {e}")
             return False
+    
+    @staticmethod
+    def _stream_media(file: DriveFile, request, sink: BinaryIO):
+        """Write a media request to sink in ranged chunks; next_chunk retries timeouts and 5xx per chunk."""
+        downloader = MediaIoBaseDownload(sink, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk(num_retries=DOWNLOAD_CHUNK_RETRIES)
+            logging.debug(f"Downloading {file.name}: {int(status.progress() * 100)}%")
+
+
+# Markdown header lines, matched in one pass over the document
+_HEADER_RE = re.compile(r'^#.*$', re.MULTILINE)
 
 
 class FallbackChunker:
@@ -231,27 +359,24 @@ class FallbackChunker:
         return chunks
     
     def _split_by_headers(self, text: str) -> List[Tuple[Optional[str], str]]:
-        """Split text by markdown headers."""
-        lines = text.split('\n')
+        """Split text by markdown headers (lines starting with '#')."""
         sections = []
         current_header = None
-        current_content = []
+        # Offset where the current section's content lines begin
+        start = 0
         
-        for line in lines:
-            if line.startswith('#'):
-                # Save previous section
-                if current_content or current_header is None:
-                    sections.append((current_header, '\n'.join(current_content)))
-                
-                # Start new section
-                current_header = line.strip('#').strip()
-                current_content = []
-            else:
-                current_content.append(line)
+        for match in _HEADER_RE.finditer(text):
+            # Sections without content are dropped, except the one before the first header
+            has_lines = match.start() > start
+            if has_lines or current_header is None:
+                sections.append((current_header, text[start:match.start() - 1] if has_lines else ''))
+            
+            current_header = match.group().strip('#').strip()
+            start = match.end() + 1
         
         # Add final section
-        if current_content:
-            sections.append((current_header, '\n'.join(current_content)))
+        if start <= len(text):
+            sections.append((current_header, text[start:]))
         
         return sections
     
@@ -276,12 +401,34 @@ class FallbackChunker:
         return chunks
 
 
+# MarkItDown instance of a conversion worker process, set by its initializer
+_worker_markitdown: Optional[MarkItDown] = None
+
+
+def _init_conversion_worker():
+    """Create the MarkItDown instance reused for every file a worker converts."""
+    global _worker_markitdown
+    _worker_markitdown = MarkItDown()
+
+
+def _convert_in_worker(source: Union[str, bytes], file_extension: str) -> str:
+    """Convert a file path or downloaded bytes to markdown inside a worker process."""
+    return DocumentProcessor.extract_markdown(_worker_markitdown, source, file_extension)
+
+
 class DocumentProcessor:
     """Handles markdown conversion and chunking."""
     
     def __init__(self, config: Config):
         self.config = config
-        self.markitdown = MarkItDown()
+        # pdfminer (behind MarkItDown) is pure Python and holds the GIL, so
+        # conversions run in processes. Spawned rather than forked, since the
+        # pipeline's worker threads are already running when the pool starts.
+        self.conversion_pool = ProcessPoolExecutor(
+            max_workers=config.conversion_workers or max(1, (os.cpu_count() or 2) - 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_conversion_worker
+        )
         
         if CHONKIE_AVAILABLE:
             self.chunker = SemanticChunker(
@@ -295,18 +442,73 @@ class DocumentProcessor:
             )
         
         logging.info(f"Using {'Chonkie' if CHONKIE_AVAILABLE else 'fallback'} chunker")
+        
+        self.tokenizer = self._load_tokenizer()
+    
+    def _load_tokenizer(self) -> Optional["Tokenizer"]:
+        """Voyage tokenizer for the embedding model, or None to keep word-count estimates."""
+        if not TOKENIZERS_AVAILABLE:
+            return None
+        try:
+            return Tokenizer.from_pretrained(f"voyageai/{self.config.embedding_model}")
+        except Exception as e:
+            logging.warning(f"Voyage tokenizer unavailable, estimating token counts: {e}")
+            return None
     
-    def convert_to_markdown(self, file_path: Path) -> Tuple[str, str]:
-        """Convert file to markdown and return (text, hash)."""
+    async def convert_to_markdown(self, source: Union[Path, io.BytesIO], file_extension: Optional[str] = None) -> Tuple[str, str]:
+        """Convert a file, or an in-memory download with its extension, to markdown and return (text, hash)."""
+        file_extension = (file_extension or source.suffix).lower()
+        # Paths cross the process boundary as strings, buffers as bytes
+        payload = str(source) if isinstance(source, Path) else source.getvalue()
         try:
-            result = self.markitdown.convert(str(file_path))
-            markdown_text = result.text_content or ""
+            markdown_text = await asyncio.get_running_loop().run_in_executor(
+                self.conversion_pool, _convert_in_worker, payload, file_extension
+            )
             text_hash = hashlib.sha256(markdown_text.encode()).hexdigest()
             return markdown_text, text_hash
         except Exception as e:
-            logging.error(f"Failed to convert {file_path} to markdown: {e}")
+            logging.error(f"Failed to convert {source} to markdown: {e}")
             raise
     
+    @staticmethod
+    def extract_markdown(markitdown: MarkItDown, source: Union[str, bytes], file_extension: str) -> str:
+        """Markdown for a file path or raw bytes, trying the PDF text layer before MarkItDown."""
+        if PYMUPDF_AVAILABLE and file_extension == '.pdf':
+            markdown_text = DocumentProcessor._extract_pdf_text(source)
+            if markdown_text is not None:
+                return markdown_text
+        
+        if isinstance(source, str):
+            result = markitdown.convert(source)
+        else:
+            result = markitdown.convert_stream(io.BytesIO(source), file_extension=file_extension)
+        return result.text_content or ""
+    
+    @staticmethod
+    def _extract_pdf_text(source: Union[str, bytes]) -> Optional[str]:
+        """Text layer of a PDF via PyMuPDF, or None if it looks scanned."""
+        doc = pymupdf.open(source) if isinstance(source, str) else pymupdf.open(stream=source, filetype='pdf')
+        with doc:
+            text = "\n\n".join(page.get_text() for page in doc)
+        return text if len(text.strip()) >= MIN_PDF_TEXT_CHARS else None
+    
+    @staticmethod
+    def hash_file(source: Union[Path, io.BytesIO]) -> str:
+        """SHA-256 of the file bytes; files on disk are read in 1 MiB blocks."""
+        if not isinstance(source, Path):
+            with source.getbuffer() as view:
+                return hashlib.sha256(view).hexdigest()
+        
+        digest = hashlib.sha256()
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def close(self):
+        """Stop the conversion worker processes."""
+        self.conversion_pool.shutdown(cancel_futures=True)
+    
     def chunk_document(self, markdown_text: str) -> List[DocumentChunk]:
         """Chunk the markdown text."""
         if CHONKIE_AVAILABLE:
@@ -318,9 +520,81 @@ class DocumentProcessor:
                     chunk_index=i,
                     token_count=len(chunk.text.split())  # Rough estimate
                 ))
-            return chunks
         else:
-            return self.chunker.chunk(markdown_text)
+            chunks = self.chunker.chunk(markdown_text)
+        
+        # Replace the estimates with exact counts in one batched encode
+        if self.tokenizer is not None and chunks:
+            encodings = self.tokenizer.encode_batch([chunk.content for chunk in chunks])
+            for chunk, encoding in zip(chunks, encodings):
+                chunk.token_count = len(encoding.ids)
+        
+        return chunks
+
+
+def normalize_embeddings(matrix: np.ndarray) -> List[np.ndarray]:
+    """Scale float32 embedding rows to unit length in place so inner-product search ranks like cosine."""
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return list(matrix)
+
+
+class EmbeddingCache:
+    """
+    Persistent exact-match cache of document embeddings in SQLite.
+    
+    Keyed by (model, sha256 of the chunk text), so re-ingesting a file or
+    ingesting shared boilerplate reuses earlier embeddings. Vectors are stored
+    as float16 to halve the footprint and returned as float32.
+    """
+    
+    # Stay under SQLite's bound-parameter limit on older builds
+    LOOKUP_BATCH = 500
+    
+    def __init__(self, path: str):
+        db_path = Path(path).expanduser()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                vec BLOB NOT NULL,
+                PRIMARY KEY (model, hash)
+            ) WITHOUT ROWID
+        """)
+    
+    @staticmethod
+    def key(text: str) -> bytes:
+        """Cache key for a chunk text."""
+        return hashlib.sha256(text.encode()).digest()
+    
+    def get_many(self, model: str, hashes: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return cached embeddings for whichever hashes are present."""
+        found = {}
+        for i in range(0, len(hashes), self.LOOKUP_BATCH):
+            batch = hashes[i:i + self.LOOKUP_BATCH]
+            rows = self.connection.execute(
+                f"SELECT hash, vec FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                (model, *batch)
+            )
+            for key, vec in rows:
+                embedding = np.frombuffer(vec, dtype=np.float16).astype(np.float32)
+                # Restore unit length lost to float16 rounding
+                embedding /= max(np.linalg.norm(embedding), 1e-12)
+                found[key] = embedding
+        return found
+    
+    def put_many(self, model: str, items: List[Tuple[bytes, np.ndarray]]):
+        """Store embeddings, keeping any existing entry for the same text."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, hash, vec) VALUES (?, ?, ?)",
+                [(model, key, embedding.astype(np.float16).tobytes()) for key, embedding in items]
+            )
+    
+    def close(self):
+        """Close the cache database."""
+        self.connection.close()
 
 
 class EmbeddingService:
@@ -328,56 +602,127 @@ class EmbeddingService:
     
     def __init__(self, config: Config):
         self.config = config
-        self.client = voyageai.Client(api_key=config.voyage_api_key)
+        client_cls = voyageai.AsyncClient if VOYAGE_ASYNC_AVAILABLE else voyageai.Client
+        self.client = client_cls(api_key=config.voyage_api_key)
         self.rate_limiter = asyncio.Semaphore(config.embed_concurrency)
+        # Earliest loop time the next request may start, shared by all batches
+        self._next_slot = 0.0
+        self.cache = EmbeddingCache(config.embedding_cache_path) if config.embedding_cache_path else None
+        
+    async def embed_chunks(self, chunks: List[DocumentChunk]) -> List[np.ndarray]:
+        """Generate unit-normalized embeddings for chunks, reusing cached ones."""
+        model = self.config.embedding_model
+        keys = [EmbeddingCache.key(chunk.content) for chunk in chunks]
+        
+        # Repeated text (disclaimers, slide masters) is embedded once and fanned
+        # back out; each distinct key maps to the first chunk carrying it
+        unique = {}
+        for i, key in enumerate(keys):
+            unique.setdefault(key, i)
         
-    async def embed_chunks(self, chunks: List[DocumentChunk]) -> List[List[float]]:
-        """Generate embeddings for chunks with rate limiting."""
-        embeddings = []
+        embeddings = self.cache.get_many(model, list(unique)) if self.cache is not None else {}
+        misses = [key for key in unique if key not in embeddings]
+        if self.cache is not None:
+            logging.info(f"Embedding cache: {len(unique) - len(misses)} hits, {len(misses)} misses")
         
+        if misses:
+            fresh = await self._embed_texts([chunks[unique[key]].content for key in misses])
+            if self.cache is not None:
+                self.cache.put_many(model, list(zip(misses, fresh)))
+            embeddings.update(zip(misses, fresh))
+        
+        return [embeddings[key] for key in keys]
+    
+    async def _embed_texts(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed texts through VoyageAI in rate-limited batches."""
         # Process in batches
         batch_size = 32  # VoyageAI recommended batch size
         
-        for i in tqdm(range(0, len(chunks), batch_size), desc="Generating embeddings"):
-            batch = chunks[i:i + batch_size]
-            batch_texts = [chunk.content for chunk in batch]
+        # All batches are submitted at once; the semaphore caps requests in
+        # flight and the QPS pacing spaces their starts. gather keeps order.
+        with tqdm(total=len(texts), desc="Generating embeddings") as progress:
+            async def embed(batch: List[str]) -> np.ndarray:
+                batch_embeddings = await self._embed_batch(batch)
+                progress.update(len(batch))
+                return batch_embeddings
             
-            batch_embeddings = await self._embed_batch(batch_texts)
-            embeddings.extend(batch_embeddings)
-            
-            # Rate limiting
-            if i + batch_size < len(chunks):
-                await asyncio.sleep(1.0 / self.config.embed_qps)
+            batch_results = await asyncio.gather(*[
+                embed(texts[i:i + batch_size])
+                for i in range(0, len(texts), batch_size)
+            ])
         
-        return embeddings
+        if not batch_results:
+            return []
+        return normalize_embeddings(np.vstack(batch_results))
+    
+    def close(self):
+        """Close the embedding cache, if any."""
+        if self.cache is not None:
+            self.cache.close()
+    
+    async def _wait_for_slot(self):
+        """Space request starts 1/embed_qps apart across concurrent batches."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1.0 / self.config.embed_qps
+        if slot > now:
+            await asyncio.sleep(slot - now)
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Embed a batch of texts with retries."""
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts with retries, as a (len(texts), dim) float32 array."""
         async with self.rate_limiter:
+            await self._wait_for_slot()
             try:
-                result = self.client.embed(
-                    texts=texts,
-                    model=self.config.embedding_model,
-                    input_type="document"
-                )
-                return result.embeddings
+                if VOYAGE_ASYNC_AVAILABLE:
+                    result = await self.client.embed(
+                        texts=texts,
+                        model=self.config.embedding_model,
+                        input_type="document"
+                    )
+                else:
+                    result = await asyncio.to_thread(
+                        self.client.embed,
+                        texts=texts,
+                        model=self.config.embedding_model,
+                        input_type="document"
+                    )
+                return np.asarray(result.embeddings, dtype=np.float32)
             except Exception as e:
                 logging.error(f"Embedding batch failed: {e}")
                 raise
 
 
+# Binary COPY of chunk rows; types follow the column order in schema.sql
+CHUNKS_COPY_SQL = """
+    COPY chunks (
+        document_id, chunk_index, section_title, section_path,
+        char_start, char_end, token_count, content
+    ) FROM STDIN WITH (FORMAT BINARY)
+"""
+CHUNKS_COPY_TYPES = ["int8", "int4", "text", "text", "int4", "int4", "int4", "text"]
+
+
 class DatabaseService:
     """PostgreSQL service for storing documents, chunks, and embeddings."""
     
     def __init__(self, config: Config):
         self.config = config
         self.connection = None
+        # Binary COPY needs the exact column type; looked up on first insert
+        self._embedding_column_type = None
     
     def connect(self):
         """Connect to PostgreSQL and register vector type."""
-        self.connection = psycopg.connect(self.config.database_url)
+        # Every statement repeats once per file, so prepare them on first use
+        self.connection = psycopg.connect(self.config.database_url, prepare_threshold=0)
         register_vector(self.connection)
+        self.connection.execute(
+            "SELECT set_config('synchronous_commit', %s, false)",
+            (self.config.synchronous_commit,)
+        )
+        self.connection.commit()
         logging.info("Connected to PostgreSQL database")
     
     def close(self):
@@ -402,7 +747,25 @@ class DatabaseService:
                 }
         return None
     
-    def insert_document(self, file: DriveFile, hash_sha256: str, download_path: str) -> int:
+    def get_document_statuses(self, drive_file_ids: List[str]) -> Dict[str, Dict]:
+        """Get statuses for many documents in one query, keyed by Drive file id."""
+        with self.connection.cursor() as cur:
+            cur.execute(
+                "SELECT drive_file_id, id, status, hash_sha256, drive_modified_time "
+                "FROM documents WHERE drive_file_id = ANY(%s::text[])",
+                (drive_file_ids,)
+            )
+            return {
+                row[0]: {
+                    'id': row[1],
+                    'status': row[2],
+                    'hash_sha256': row[3],
+                    'drive_modified_time': row[4]
+                }
+                for row in cur
+            }
+    
+    def insert_document(self, file: DriveFile, hash_sha256: str, download_path: Optional[str]) -> int:
         """Insert or update document record."""
         with self.connection.cursor() as cur:
             # Get file extension for file_type
@@ -444,38 +807,84 @@ class DatabaseService:
                     (status, error_message, document_id)
                 )
     
-    def insert_chunks_and_embeddings(self, document_id: int, chunks: List[DocumentChunk], embeddings: List[List[float]]):
-        """Insert chunks and their embeddings in a transaction."""
+    def insert_chunks_and_embeddings(self, document_id: int, chunks: List[DocumentChunk], embeddings: List[np.ndarray]):
+        """Insert chunks and their embeddings in a transaction, streaming rows with binary COPY."""
         with self.connection.cursor() as cur:
             # Clear existing chunks (will cascade to embeddings)
             cur.execute("DELETE FROM chunks WHERE document_id = %s", (document_id,))
             
-            # Insert chunks and embeddings
-            for chunk, embedding in zip(chunks, embeddings):
-                # Insert chunk
-                cur.execute("""
-                    INSERT INTO chunks (
-                        document_id, chunk_index, section_title, section_path,
-                        char_start, char_end, token_count, content
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    document_id, chunk.chunk_index, chunk.section_title,
-                    chunk.section_path, chunk.char_start, chunk.char_end,
-                    chunk.token_count, chunk.content
-                ))
-                
-                chunk_id = cur.fetchone()[0]
-                
-                # Insert embedding
-                cur.execute(
-                    "INSERT INTO embeddings (chunk_id, embedding) VALUES (%s, %s)",
-                    (chunk_id, embedding)
-                )
+            # Stream chunk rows in one COPY instead of an INSERT round-trip per chunk
+            with cur.copy(CHUNKS_COPY_SQL) as copy:
+                copy.set_types(CHUNKS_COPY_TYPES)
+                for chunk in chunks:
+                    copy.write_row((
+                        document_id, chunk.chunk_index, chunk.section_title,
+                        chunk.section_path, chunk.char_start, chunk.char_end,
+                        chunk.token_count, chunk.content
+                    ))
+            
+            # COPY can't return ids; recover them by the (document_id, chunk_index) key
+            cur.execute(
+                "SELECT chunk_index, id FROM chunks WHERE document_id = %s",
+                (document_id,)
+            )
+            chunk_ids = dict(cur.fetchall())
+            
+            with cur.copy("COPY embeddings (chunk_id, embedding) FROM STDIN WITH (FORMAT BINARY)") as copy:
+                copy.set_types(["int8", self._embedding_type(cur)])
+                for chunk, embedding in zip(chunks, embeddings):
+                    copy.write_row((chunk_ids[chunk.chunk_index], embedding))
+    
+    def _embedding_type(self, cur) -> str:
+        """Column type of embeddings.embedding (vector, or halfvec once the backend migrates it)."""
+        if self._embedding_column_type is None:
+            cur.execute(
+                "SELECT atttypid::regtype::text FROM pg_attribute "
+                "WHERE attrelid = 'embeddings'::regclass AND attname = 'embedding'"
+            )
+            self._embedding_column_type = cur.fetchone()[0]
+        return self._embedding_column_type
+    
+    def drop_vector_indexes(self) -> List[str]:
+        """Drop the ANN indexes on embeddings and return their definitions for rebuilding."""
+        with self.connection.cursor() as cur:
+            cur.execute("""
+                SELECT indexname, indexdef FROM pg_indexes
+                WHERE tablename = 'embeddings'
+                  AND (indexdef ILIKE '% USING hnsw %' OR indexdef ILIKE '% USING ivfflat %')
+            """)
+            indexes = cur.fetchall()
+            for index_name, _ in indexes:
+                cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(index_name)))
+        self.connection.commit()
+        
+        # If the run dies before rebuilding, these statements restore the indexes by hand
+        for index_name, index_def in indexes:
+            logging.warning(f"Dropped vector index {index_name} for bulk load; to restore manually: {index_def};")
+        return [index_def for _, index_def in indexes]
+    
+    def create_vector_indexes(self, index_defs: List[str]):
+        """Recreate ANN indexes from their saved definitions with parallel workers."""
+        if not index_defs:
+            return
+        with self.connection.cursor() as cur:
+            cur.execute(
+                "SELECT set_config('max_parallel_maintenance_workers', %s, true), "
+                "set_config('maintenance_work_mem', %s, true)",
+                (str(self.config.hnsw_build_workers), self.config.hnsw_build_memory)
+            )
+            for index_def in index_defs:
+                logging.info(f"Rebuilding vector index: {index_def}")
+                cur.execute(index_def)
+        self.connection.commit()
     
     def commit(self):
         """Commit current transaction."""
         self.connection.commit()
+    
+    def rollback(self):
+        """Roll back current transaction."""
+        self.connection.rollback()
 
 
 class IngestionController:
@@ -487,6 +896,9 @@ class IngestionController:
         self.processor = DocumentProcessor(config)
         self.embedding_service = EmbeddingService(config)
         self.db_service = DatabaseService(config)
+        # Set per run: whether to drop ANN indexes, and their saved definitions once dropped
+        self._bulk_load = False
+        self._index_defs: Optional[List[str]] = None
         
         # Setup logging
         logging.basicConfig(
@@ -515,27 +927,23 @@ class IngestionController:
             
             stats = {'processed': 0, 'skipped': 0, 'errors': 0}
             
-            for file in tqdm(files, desc="Processing files"):
-                try:
-                    result = await self._process_file(file, download_dir, resume)
-                    if result == 'processed':
-                        stats['processed'] += 1
-                    elif result == 'skipped':
-                        stats['skipped'] += 1
-                except Exception as e:
-                    logging.error(f"Failed to process {file.name}: {e}")
-                    stats['errors'] += 1
-                    
-                    # Update status in DB
-                    try:
-                        doc_status = self.db_service.get_document_status(file.id)
-                        if doc_status:
-                            self.db_service.update_document_status(
-                                doc_status['id'], 'error', str(e)
-                            )
-                            self.db_service.commit()
-                    except:
-                        pass
+            statuses = self.db_service.get_document_statuses([file.id for file in files])
+            
+            # Inserting under an HNSW index walks the graph per row; when many
+            # files may be rewritten, load without it and build it once at the
+            # end. The drop waits for the first file that actually writes, so a
+            # run that skips everything leaves the index (and searches) alone.
+            changed = sum(1 for file in files if self._may_need_processing(file, statuses.get(file.id), resume))
+            self._bulk_load = changed >= self.config.rebuild_index_min_files
+            self._index_defs = None
+            
+            try:
+                await self._process_files(files, statuses, download_dir, resume, stats)
+            finally:
+                if self._index_defs:
+                    # A failed file can leave the shared connection in an aborted transaction
+                    self.db_service.rollback()
+                    self.db_service.create_vector_indexes(self._index_defs)
             
             # Final stats
             logging.info(f"Ingestion completed: {stats['processed']} processed, "
@@ -543,6 +951,62 @@ class IngestionController:
                         
         finally:
             self.db_service.close()
+            self.embedding_service.close()
+            self.processor.close()
+    
+    @staticmethod
+    def _may_need_processing(file: DriveFile, doc_status: Optional[Dict], resume: bool) -> bool:
+        """Whether a file might be rewritten: not done yet, or modified in Drive since it was."""
+        if not doc_status or doc_status['status'] != 'done':
+            return True
+        if resume:
+            return False
+        stored = doc_status.get('drive_modified_time')
+        if stored is None:
+            return True
+        return datetime.fromisoformat(file.modified_time.replace('Z', '+00:00')) != stored
+    
+    def _drop_indexes_for_bulk_load(self):
+        """Drop the ANN indexes once, before the first write of a bulk run."""
+        if self._bulk_load and self._index_defs is None:
+            self._index_defs = self.db_service.drop_vector_indexes()
+    
+    async def _process_files(self, files: List[DriveFile], statuses: Dict[str, Dict], download_dir: Path,
+                             resume: bool, stats: Dict[str, int]):
+        """Process up to file_concurrency files at once, recording outcomes in stats."""
+        semaphore = asyncio.Semaphore(self.config.file_concurrency)
+        
+        with tqdm(total=len(files), desc="Processing files") as progress:
+            async def process_guarded(file: DriveFile):
+                async with semaphore:
+                    await self._process_file_recorded(file, statuses.get(file.id), download_dir, resume, stats)
+                progress.update(1)
+            
+            await asyncio.gather(*(process_guarded(file) for file in files))
+    
+    async def _process_file_recorded(self, file: DriveFile, doc_status: Optional[Dict], download_dir: Path,
+                                     resume: bool, stats: Dict[str, int]):
+        """Process one file, counting its outcome and recording failures in the DB."""
+        try:
+            result = await self._process_file(file, doc_status, download_dir, resume)
+            if result == 'processed':
+                stats['processed'] += 1
+            elif result == 'skipped':
+                stats['skipped'] += 1
+        except Exception as e:
+            logging.error(f"Failed to process {file.name}: {e}")
+            stats['errors'] += 1
+            
+            # Update status in DB
+            try:
+                doc_status = self.db_service.get_document_status(file.id)
+                if doc_status:
+                    self.db_service.update_document_status(
+                        doc_status['id'], 'error', str(e)
+                    )
+                    self.db_service.commit()
+            except:
+                pass
     
     def _log_dry_run_summary(self, files: List[DriveFile]):
         """Log summary for dry run mode."""
@@ -562,12 +1026,18 @@ class IngestionController:
         for mime_type, count in mime_counts.items():
             logging.info(f"  - {mime_type}: {count} files")
     
-    async def _process_file(self, file: DriveFile, download_dir: Path, resume: bool) -> str:
-        """Process a single file through the complete pipeline."""
+    async def _process_file(self, file: DriveFile, doc_status: Optional[Dict], download_dir: Path, resume: bool) -> str:
+        """
+        Process a single file through the complete pipeline.
         
-        # Check if already processed
-        doc_status = self.db_service.get_document_status(file.id)
+        Download and chunking run in worker threads, conversion in worker
+        processes. Database calls stay on the event loop thread with no await
+        between a write and its commit, so concurrent files never interleave
+        on the shared connection.
+        doc_status is the document's row as fetched before the run, if any.
+        """
         
+        # Check if already processed
         if resume and doc_status:
             if doc_status['status'] == 'done':
                 logging.debug(f"Skipping {file.name} - already processed")
@@ -579,24 +1049,41 @@ class IngestionController:
         file_ext = '.pdf' if file.mime_type == 'application/pdf' else '.pptx'
         download_path = download_dir / file.id / f"{file.id}{file_ext}"
         
-        if not self.drive_client.download_file(file, download_path):
+        # Small files (and exports, whose size Drive doesn't report) skip the
+        # disk round trip unless downloads are being kept in download_dir
+        in_memory = not self.config.download_dir and (file.size_bytes or 0) < IN_MEMORY_DOWNLOAD_MAX
+        sink = io.BytesIO() if in_memory else None
+        
+        if not await asyncio.to_thread(self.drive_client.download_file, file, download_path, sink):
             raise Exception("Failed to download file")
+        source = sink if in_memory else download_path
         
-        # Convert to markdown
-        markdown_text, text_hash = self.processor.convert_to_markdown(download_path)
+        # Downloaded files are byte-stable, so an unchanged one is detected from
+        # its bytes before the expensive conversion. Exports are regenerated by
+        # Drive on every request, so their hash is taken over the markdown.
+        if file.mime_type in EXPORTED_MIME_TYPES:
+            markdown_text, text_hash = await self.processor.convert_to_markdown(source, file_ext)
+        else:
+            markdown_text, text_hash = None, await asyncio.to_thread(self.processor.hash_file, source)
         
         # Check if content changed
         if doc_status and doc_status.get('hash_sha256') == text_hash:
             logging.debug(f"Skipping {file.name} - content unchanged")
             return 'skipped'
         
-        # Insert/update document record
-        document_id = self.db_service.insert_document(file, text_hash, str(download_path))
+        # Convert to markdown
+        if markdown_text is None:
+            markdown_text, _ = await self.processor.convert_to_markdown(source, file_ext)
+        
+        # Insert/update document record; no transaction is open at this point,
+        # so the index drop's commit can't split another file's writes
+        self._drop_indexes_for_bulk_load()
+        document_id = self.db_service.insert_document(file, text_hash, None if in_memory else str(download_path))
         self.db_service.commit()
         
         try:
             # Chunk document
-            chunks = self.processor.chunk_document(markdown_text)
+            chunks = await asyncio.to_thread(self.processor.chunk_document, markdown_text)
             logging.info(f"Created {len(chunks)} chunks for {file.name}")
             
             if not chunks:
@@ -614,6 +1101,8 @@ class IngestionController:
             return 'processed'
             
         except Exception as e:
+            # A failed statement aborts the shared transaction for every file
+            self.db_service.rollback()
             self.db_service.update_document_status(document_id, 'error', str(e))
             self.db_service.commit()
             raise
@@ -625,12 +1114,14 @@ def main():
     parser.add_argument('--resume', action='store_true', help='Resume from last state')
     parser.add_argument('--max-files', type=int, help='Maximum number of files to process')
     parser.add_argument('--concurrency', type=int, default=2, help='Embedding concurrency')
+    parser.add_argument('--file-concurrency', type=int, default=4, help='Files processed concurrently')
     parser.add_argument('--qps', type=float, default=4.0, help='Embedding requests per second')
     parser.add_argument('--model', default='voyage-2', help='VoyageAI embedding model')
     parser.add_argument('--chunk-size', type=int, default=1200, help='Chunk size in tokens')
     parser.add_argument('--chunk-overlap', type=int, default=200, help='Chunk overlap')
     parser.add_argument('--download-dir', help='Directory to store downloaded files')
     parser.add_argument('--include-mime', help='Comma-separated mime types to include')
+    parser.add_argument('--embedding-cache', help='SQLite embedding cache path (empty string disables it)')
     
     args = parser.parse_args()
     
@@ -638,6 +1129,8 @@ def main():
     config_dict = {}
     if args.concurrency:
         config_dict['embed_concurrency'] = args.concurrency
+    if args.file_concurrency:
+        config_dict['file_concurrency'] = args.file_concurrency
     if args.qps:
         config_dict['embed_qps'] = args.qps
     if args.model:
@@ -650,6 +1143,8 @@ def main():
         config_dict['download_dir'] = args.download_dir
     if args.include_mime:
         config_dict['include_mime_types'] = args.include_mime
+    if args.embedding_cache is not None:
+        config_dict['embedding_cache_path'] = args.embedding_cache
     
     # Load configuration
     config = Config(**config_dict)
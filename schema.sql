@@ -40,6 +40,8 @@ CREATE TABLE IF NOT EXISTS chunks (
 
 -- Embeddings table: stores vector embeddings for chunks
 -- Using 1024 dimensions for voyage-2 model
+-- With USE_HALFVEC=true, `python -m app.migrate` (from backend/) converts this column to HALFVEC(1024);
+-- search_similar_chunks keeps working through pgvector's implicit vector -> halfvec cast
 CREATE TABLE IF NOT EXISTS embeddings (
     id BIGSERIAL PRIMARY KEY,
     chunk_id BIGINT NOT NULL UNIQUE REFERENCES chunks(id) ON DELETE CASCADE,
@@ -49,13 +51,22 @@ CREATE TABLE IF NOT EXISTS embeddings (
 -- Create indexes for performance
 CREATE INDEX IF NOT EXISTS idx_documents_drive_file_id ON documents(drive_file_id);
 CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(status);
+-- Partial index so counts/joins over finished documents stay index-only
+CREATE INDEX IF NOT EXISTS idx_documents_done ON documents(id) WHERE status = 'done';
 CREATE INDEX IF NOT EXISTS idx_documents_hash_sha256 ON documents(hash_sha256);
 CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id);
 
--- Vector similarity index (using IVFFlat with cosine distance)
--- Start with lists=100, can be adjusted based on corpus size
-CREATE INDEX IF NOT EXISTS idx_embeddings_vector 
-ON embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+-- Embeddings are stored unit-normalized (ingest normalizes them), so inner product
+-- ranks exactly like cosine similarity. Rows written before normalization are fixed
+-- once with `python -m app.migrate --normalize-embeddings` (pgvector >= 0.7.0)
+
+-- The old ivfflat cosine index can't serve <#> but still costs every insert
+DROP INDEX IF EXISTS idx_embeddings_vector;
+
+-- Vector similarity index (using HNSW with inner product, pgvector >= 0.5.0)
+-- `python -m app.migrate` builds this if missing, tuning m/ef_construction to corpus size
+CREATE INDEX IF NOT EXISTS idx_embeddings_hnsw_ip 
+ON embeddings USING hnsw (embedding vector_ip_ops) WITH (m = 24, ef_construction = 128);
 
 -- Create a view for easy querying with all related data
 CREATE OR REPLACE VIEW document_chunks_with_embeddings AS
@@ -81,10 +92,14 @@ JOIN chunks c ON d.id = c.document_id
 JOIN embeddings e ON c.id = e.chunk_id;
 
 -- Function to get similar chunks by vector search
--- Usage: SELECT * FROM search_similar_chunks(query_embedding, limit) ORDER BY similarity DESC;
+-- Usage: SELECT * FROM search_similar_chunks(query_embedding, limit[, filters]) ORDER BY similarity DESC;
+-- filters is an optional jsonb object; supported keys: file_type, drive_file_id
+-- The two-argument version is dropped first so calls without filters are not ambiguous
+DROP FUNCTION IF EXISTS search_similar_chunks(VECTOR(1024), INTEGER);
 CREATE OR REPLACE FUNCTION search_similar_chunks(
     query_embedding VECTOR(1024),
-    result_limit INTEGER DEFAULT 10
+    result_limit INTEGER DEFAULT 10,
+    filters JSONB DEFAULT NULL
 )
 RETURNS TABLE(
     chunk_id BIGINT,
@@ -106,12 +121,14 @@ BEGIN
         c.section_title,
         c.content,
         d.drive_web_view_link,
-        1 - (e.embedding <=> query_embedding) as similarity
+        -(e.embedding <#> query_embedding) as similarity
     FROM embeddings e
     JOIN chunks c ON e.chunk_id = c.id
     JOIN documents d ON c.document_id = d.id
     WHERE d.status = 'done'
-    ORDER BY e.embedding <=> query_embedding
+      AND (filters->>'file_type' IS NULL OR d.file_type = filters->>'file_type')
+      AND (filters->>'drive_file_id' IS NULL OR d.drive_file_id = filters->>'drive_file_id')
+    ORDER BY e.embedding <#> query_embedding
     LIMIT result_limit;
 END;
 $$ LANGUAGE plpgsql;
@@ -120,4 +137,4 @@ $$ LANGUAGE plpgsql;
 COMMENT ON TABLE documents IS 'Stores metadata for documents ingested from Google Drive';
 COMMENT ON TABLE chunks IS 'Stores text chunks extracted from documents';  
 COMMENT ON TABLE embeddings IS 'Stores vector embeddings for text chunks using voyage-2 model (1024 dims)';
-COMMENT ON FUNCTION search_similar_chunks IS 'Performs cosine similarity search over embeddings';
\ No newline at end of file
+COMMENT ON FUNCTION search_similar_chunks IS 'Performs cosine similarity search over unit-normalized embeddings via inner product';
\ No newline at end of file
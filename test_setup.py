@@ -8,9 +8,32 @@ This script tests:
 3. Environment variables (if provided)
 """
 
+import contextlib
+import functools
+import importlib.util
+import io
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+ENV_FILE = Path('.env')
+
+
+@functools.cache
+def load_env_file() -> dict:
+    """Parse .env once, apply it under any variables already set, and return it."""
+    if not ENV_FILE.exists():
+        return {}
+    
+    from dotenv import dotenv_values
+    
+    values = {key: value for key, value in dotenv_values(ENV_FILE).items() if value is not None}
+    for key, value in values.items():
+        os.environ.setdefault(key, value)
+    return values
+
+
 def test_database():
     """Test PostgreSQL connection and schema."""
     print("🔍 Testing database connection...")
@@ -19,24 +42,37 @@ def test_database():
         import psycopg
         from pgvector.psycopg import register_vector
         
-        # Connect to database
-        conn = psycopg.connect("postgresql://localhost/docsearch_rag")
+        # Connect to database; fail fast rather than hang when Postgres is down
+        conn = psycopg.connect(
+            "postgresql://localhost/docsearch_rag",
+            connect_timeout=2,
+            options="-c statement_timeout=2000"
+        )
         register_vector(conn)
         
         with conn.cursor() as cur:
+            # Extension, tables and embedding column in one round-trip, tagged by kind
+            cur.execute("""
+                SELECT 'extension', extname FROM pg_extension WHERE extname = 'vector'
+                UNION ALL
+                SELECT 'table', table_name FROM information_schema.tables 
+                WHERE table_schema = 'public' 
+                AND table_name IN ('documents', 'chunks', 'embeddings')
+                UNION ALL
+                SELECT 'column', data_type FROM information_schema.columns 
+                WHERE table_name = 'embeddings' AND column_name = 'embedding';
+            """)
+            found = {'extension': [], 'table': [], 'column': []}
+            for kind, value in cur.fetchall():
+                found[kind].append(value)
+            
             # Check if pgvector extension is enabled
-            cur.execute("SELECT extname FROM pg_extension WHERE extname = 'vector';")
-            if not cur.fetchone():
+            if not found['extension']:
                 print("❌ pgvector extension not found")
                 return False
                 
             # Check if our tables exist
-            cur.execute("""
-                SELECT table_name FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name IN ('documents', 'chunks', 'embeddings');
-            """)
-            tables = [row[0] for row in cur.fetchall()]
+            tables = found['table']
             
             expected_tables = {'documents', 'chunks', 'embeddings'}
             if not expected_tables.issubset(set(tables)):
@@ -44,21 +80,15 @@ def test_database():
                 print(f"❌ Missing tables: {missing}")
                 return False
             
-            # Check embeddings table dimension
-            cur.execute("""
-                SELECT column_name, data_type, character_maximum_length 
-                FROM information_schema.columns 
-                WHERE table_name = 'embeddings' AND column_name = 'embedding';
-            """)
-            embedding_col = cur.fetchone()
-            if not embedding_col:
+            # Check embeddings table column
+            if not found['column']:
                 print("❌ Embedding column not found")
                 return False
                 
             print("✅ Database connection and schema OK")
             print(f"   - pgvector extension: enabled")
             print(f"   - Tables: {', '.join(sorted(tables))}")
-            print(f"   - Embedding column: {embedding_col[1]}")
+            print(f"   - Embedding column: {found['column'][0]}")
             return True
             
     except Exception as e:
@@ -69,6 +99,15 @@ def test_database():
             conn.close()
 
 
+def is_installed(package: str) -> bool:
+    """Check a package can be imported without running its top-level code."""
+    try:
+        return importlib.util.find_spec(package) is not None
+    except ModuleNotFoundError:
+        # A missing parent package of a dotted name
+        return False
+
+
 def test_python_packages():
     """Test required Python packages."""
     print("\n🔍 Testing Python packages...")
@@ -80,6 +119,7 @@ def test_python_packages():
         ('voyageai', 'VoyageAI'),
         ('psycopg', 'PostgreSQL adapter'),
         ('pgvector.psycopg', 'pgvector'),
+        ('numpy', 'NumPy'),
         ('pydantic', 'Pydantic'),
         ('tenacity', 'Tenacity'),
         ('tqdm', 'Progress bars'),
@@ -92,19 +132,22 @@ def test_python_packages():
     
     all_good = True
     
-    for package, description in required_packages:
-        try:
-            __import__(package)
+    # Spec lookups are filesystem stats, so probe all packages at once
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        required_found = list(executor.map(is_installed, [package for package, _ in required_packages]))
+        optional_found = list(executor.map(is_installed, [package for package, _ in optional_packages]))
+    
+    for (package, description), found in zip(required_packages, required_found):
+        if found:
             print(f"✅ {description}")
-        except ImportError as e:
-            print(f"❌ {description}: {e}")
+        else:
+            print(f"❌ {description}: {package} not installed")
             all_good = False
     
-    for package, description in optional_packages:
-        try:
-            __import__(package)
+    for (package, description), found in zip(optional_packages, optional_found):
+        if found:
             print(f"✅ {description} (optional)")
-        except ImportError:
+        else:
             print(f"⚠️  {description} (optional): not installed")
     
     return all_good
@@ -114,14 +157,10 @@ def test_env_vars():
     """Test environment variables if available."""
     print("\n🔍 Testing environment variables...")
     
-    import os
-    from dotenv import load_dotenv
-    
     # Try to load .env file
-    env_file = Path('.env')
-    if env_file.exists():
-        load_dotenv(env_file)
-        print(f"✅ Loaded environment from {env_file}")
+    if ENV_FILE.exists():
+        load_env_file()
+        print(f"✅ Loaded environment from {ENV_FILE}")
     else:
         print("ℹ️  No .env file found, checking system environment")
     
@@ -165,19 +204,28 @@ def test_ingestion_script():
     print("\n🔍 Testing ingestion script...")
     
     try:
-        import subprocess
-        result = subprocess.run(
-            [sys.executable, 'ingest_gdrive.py', '--help'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        # Load and run --help in-process rather than paying for a second interpreter
+        spec = importlib.util.spec_from_file_location('ingest_gdrive', 'ingest_gdrive.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        
+        argv = sys.argv
+        sys.argv = ['ingest_gdrive.py', '--help']
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                module.main()
+        except SystemExit as exit_:
+            exit_code = exit_.code
+        else:
+            exit_code = None
+        finally:
+            sys.argv = argv
         
-        if result.returncode == 0:
+        if exit_code == 0:
             print("✅ Ingestion script syntax OK")
             return True
         else:
-            print(f"❌ Script failed: {result.stderr}")
+            print(f"❌ Script failed: --help exited with {exit_code}")
             return False
             
     except Exception as e: